@@ -0,0 +1,187 @@
+import pandas as pd
+
+import cube
+import metrics
+from queries import LINE_ITEM_FROM, LINE_ITEM_WHERE
+
+
+# Column name -> SQL expression for every dimension the warehouse can group by
+DIMENSION_EXPRESSIONS = {
+    "month": "date_trunc('MONTH', o.end_date)",
+    "main_product_category": "mpc.name",
+    "main_product_category_group": "mpcg.name",
+    "industry_name": "i.name",
+    "seller_location_name": "sl.name",
+    "orderline_item_type_name": "olit.name",
+    "user_group_account_owner_id": "ug.account_owner_id",
+    "account_owner_first_name": "uo.first_name",
+    "account_owner_last_name": "uo.last_name",
+    "order_status": "o.status",
+    "user_group_id": "ug.id",
+}
+
+MEASURE_EXPRESSIONS = {
+    "customer_amount": "SUM(oli.rate * oli.quantity * (1 + oli.platform_fee_percent * 0.01))",
+    "supplier_amount": "SUM(oli.rate * oli.quantity)",
+    "order_line_total": "SUM(oli.rate * oli.quantity)",
+    "line_count": "COUNT(*)",
+    "order_count": "COUNT(DISTINCT o.id)",
+    "non_staff_order_count": "COUNT(DISTINCT CASE WHEN u.is_staff = false THEN o.id END)",
+}
+
+# Name -> dimensions of every grouping the widgets read. The cube carries the additive
+# measures; the other sets exist for the distinct counts that cannot be rolled up from it.
+GROUPING_SETS = {
+    "cube": cube.CUBE_DIMENSIONS,
+    "total": [],
+    "month": ["month"],
+    "month_user_group": ["month", "user_group_id"],
+    "industry": ["industry_name"],
+    "industry_seller_location": ["industry_name", "seller_location_name"],
+}
+
+
+# Column name -> SQL expression for the one-row query behind the KPI cards
+KPI_EXPRESSIONS = {
+    "order_count": MEASURE_EXPRESSIONS["order_count"],
+    "line_total": MEASURE_EXPRESSIONS["order_line_total"],
+    "customer_amount": f"SUM(CASE WHEN o.status = '{metrics.COMPLETE}' THEN oli.rate * oli.quantity * (1 + oli.platform_fee_percent * 0.01) END)",
+    "supplier_amount": f"SUM(CASE WHEN o.status = '{metrics.COMPLETE}' THEN oli.rate * oli.quantity END)",
+    "non_staff_order_count": MEASURE_EXPRESSIONS["non_staff_order_count"],
+}
+
+
+# Line-item columns the widgets read when aggregating in pandas
+LINE_ITEM_COLUMNS = [
+    "order_id",
+    "orderline_id",
+    "order_end_date",
+    *metrics.NUMERIC_COLUMNS,
+    *[name for name in DIMENSION_EXPRESSIONS if name != "month"],
+    "user_is_staff",
+]
+
+
+def grouping_id(dimensions):
+    """The value of `grouping_id(...)` over all dimensions for a set grouped by `dimensions`."""
+    names = list(DIMENSION_EXPRESSIONS)
+    return sum(1 << (len(names) - 1 - i) for i, name in enumerate(names) if name not in dimensions)
+
+
+def build_aggregate_query(filter_clause=""):
+    """Builds one GROUPING SETS query that returns every aggregate in `GROUPING_SETS`."""
+    expressions = list(DIMENSION_EXPRESSIONS.values())
+    select_list = [f"{expression} AS {name}" for name, expression in DIMENSION_EXPRESSIONS.items()]
+    select_list.append(f"grouping_id({', '.join(expressions)}) AS grouping_id")
+    select_list.extend(f"{expression} AS {name}" for name, expression in MEASURE_EXPRESSIONS.items())
+    grouping_sets = [
+        "(" + ", ".join(DIMENSION_EXPRESSIONS[name] for name in dimensions) + ")"
+        for dimensions in GROUPING_SETS.values()
+    ]
+    return f"""
+        SELECT
+            {(',' + chr(10) + '            ').join(select_list)}
+        FROM {LINE_ITEM_FROM}
+        WHERE {LINE_ITEM_WHERE}
+            {filter_clause}
+        GROUP BY GROUPING SETS (
+            {(',' + chr(10) + '            ').join(grouping_sets)}
+        )
+    """
+
+
+def build_kpi_query(filter_clause=""):
+    """Builds the single-row query that returns the KPI card totals, cheap enough to paint first."""
+    return f"""
+        SELECT
+            {(',' + chr(10) + '            ').join(f"{expression} AS {name}" for name, expression in KPI_EXPRESSIONS.items())}
+        FROM {LINE_ITEM_FROM}
+        WHERE {LINE_ITEM_WHERE}
+            {filter_clause}
+    """
+
+
+def split_aggregates(result):
+    """Splits the rows of `build_aggregate_query` into one frame per grouping set.
+
+    Like a pandas groupby, every set except the cube drops groups with a missing dimension
+    and is sorted by its dimensions.
+    """
+    result = result.copy()
+    for column in MEASURE_EXPRESSIONS:
+        result[column] = pd.to_numeric(result[column], errors="coerce").astype("float64")
+    result["month"] = pd.to_datetime(result["month"], errors="coerce").dt.to_period("M")
+    aggregates = {}
+    for name, dimensions in GROUPING_SETS.items():
+        rows = result[result["grouping_id"] == grouping_id(dimensions)]
+        if name != "cube":
+            rows = rows.dropna(subset=dimensions).sort_values(dimensions)
+        aggregates[name] = rows[list(dimensions) + list(MEASURE_EXPRESSIONS)].reset_index(drop=True)
+    return aggregates
+
+
+def line_item_aggregates(frame):
+    """Computes the same frames as `split_aggregates` from prepared line items in pandas."""
+    frame = frame.assign(non_staff_order_id=frame["order_id"].where(frame["user_is_staff"] == False))
+    measures = dict(
+        customer_amount=("customer_amount", "sum"),
+        supplier_amount=("supplier_amount", "sum"),
+        order_line_total=("order_line_total", "sum"),
+        line_count=("orderline_id", "size"),
+        order_count=("order_id", "nunique"),
+        non_staff_order_count=("non_staff_order_id", "nunique"),
+    )
+    aggregates = {"cube": cube.build_cube(frame)}
+    for name, dimensions in GROUPING_SETS.items():
+        if name == "cube":
+            continue
+        if dimensions:
+            aggregates[name] = frame.groupby(dimensions, observed=True).agg(**measures).reset_index()
+        else:
+            aggregates[name] = frame.groupby(lambda _: 0).agg(**measures).reset_index(drop=True)
+    return aggregates
+
+
+def summarize(aggregates):
+    """Computes the KPI card values, matching `metrics.summarize` on the line items."""
+    complete = metrics.completed(aggregates["cube"])
+    total = aggregates["total"]
+    return _card_values(
+        order_count=int(total["order_count"].sum()),
+        line_total=aggregates["cube"]["order_line_total"].sum(),
+        customer_amount=complete["customer_amount"].sum(),
+        supplier_amount=complete["supplier_amount"].sum(),
+        non_staff_order_count=int(total["non_staff_order_count"].sum()),
+    )
+
+
+def summarize_kpis(result):
+    """Computes the KPI card values from the row of `build_kpi_query`, matching `summarize`."""
+    row = {name: 0.0 for name in KPI_EXPRESSIONS}
+    if not result.empty:
+        values = pd.to_numeric(result.iloc[0][list(KPI_EXPRESSIONS)], errors="coerce").astype("float64")
+        row.update(values.fillna(0.0))
+    return _card_values(
+        order_count=int(row["order_count"]),
+        line_total=row["line_total"],
+        customer_amount=row["customer_amount"],
+        supplier_amount=row["supplier_amount"],
+        non_staff_order_count=int(row["non_staff_order_count"]),
+    )
+
+
+def _card_values(order_count, line_total, customer_amount, supplier_amount, non_staff_order_count):
+    return {
+        "order_count": order_count,
+        "line_total": line_total,
+        "gmv": customer_amount,
+        "net_revenue": customer_amount - supplier_amount,
+        "take_rate": metrics.take_rate(customer_amount, supplier_amount),
+        "average_order_value": line_total / order_count if order_count != 0 else 0,
+        "non_staff_order_count": non_staff_order_count,
+    }
+
+
+def monthly_ratios(aggregates):
+    """Average order value and take rate per month, rounded to two decimals."""
+    return metrics.ratios(aggregates["month"].set_index("month")).reset_index()
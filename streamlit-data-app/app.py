@@ -1,14 +1,37 @@
 import os
-from databricks import sql 
-from databricks.sdk.core import Config
+import json
+import tempfile
+import logging
+import threading
+import time
+from concurrent.futures import wait
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-from streamlit_date_picker import date_range_picker, date_picker, PickerType
-from pyspark import SparkConf, SparkContext
-from pyspark.sql import SQLContext
-import altair as alt
+import pyarrow as pa
+from datetime import datetime
+from streamlit_date_picker import date_range_picker, PickerType
 from streamlit_echarts import st_echarts
+from connection_pool import ConnectionPool
+from incremental_refresh import SnapshotStore
+from query_executor import QueryExecutor
+from payload_cache import PayloadCache
+from shared_cache import SharedCache, cache_key, load_store
+from background_refresh import BackgroundRefresher, Refreshed
+from query_log import QueryLog
+import metrics
+import cube
+import aggregates
+import arrow_filters
+import chart_budget
+import chart_specs
+import line_item_loader
+import line_item_export
+import line_item_schema
+import projection
+import tracing
+from queries import build_filter_clause, build_search_clause, build_page_query, build_count_query, split_date_range, DATA_VERSION_QUERY, LINE_ITEM_SELECT
+
+logger = logging.getLogger(__name__)
 
 
 # Ensure environment variable is set correctly
@@ -18,143 +41,500 @@ assert "DATABRICKS_HTTP_PATH" in st.secrets, "DATABRICKS_HTTP_PATH must be set"
 assert "DATABRICKS_ACCESS_TOKEN" in st.secrets, "DATABRICKS_ACCESS_TOKEN must be set"
 assert "DATABRICKS_WAREHOUSE_ID" in st.secrets, "DATABRICKS_WAREHOUSE_ID must be set"
 
-def sqlQuery(query: str) -> pd.DataFrame:
-    """Runs a SQL query on Databricks and returns the result as a Pandas DataFrame."""
+def getSetting(name, default):
+    """Reads an optional setting from Streamlit secrets, falling back to the environment."""
+    if name in st.secrets:
+        return st.secrets[name]
+    return os.environ.get(name, default)
+
+
+def getFlag(name, default):
+    """Reads an optional on/off setting; "1", "true", "yes" and "on" mean on."""
+    return str(getSetting(name, default)).lower() in ("1", "true", "yes", "on")
+
+
+# Queries run either on the executor's worker threads (line-item shards) or straight on a
+# script thread (KPIs, categories, data version, the raw explorer and exports). The pool holds a
+# connection per worker plus DATABRICKS_POOL_RESERVE more, so a load that keeps every worker
+# busy never leaves the script threads waiting for a connection.
+QUERY_WORKERS = int(getSetting("DATABRICKS_QUERY_WORKERS", 4))
+POOL_RESERVE = int(getSetting("DATABRICKS_POOL_RESERVE", 2))
+
+
+@st.cache_resource
+def getConnectionPool() -> ConnectionPool:
+    """Returns the process-wide pool of Databricks connections shared by every session."""
 
     # Fetch credentials from Streamlit secrets
     server_hostname = st.secrets["DATABRICKS_SERVER_HOSTNAME"]
     http_path = st.secrets["DATABRICKS_HTTP_PATH"]
     access_token = st.secrets["DATABRICKS_ACCESS_TOKEN"]
 
-    try:
-        with sql.connect(
+    def connect():
+        # The connector pulls in thrift and its dependencies; import it on first connection
+        from databricks import sql
+        return sql.connect(
             server_hostname=server_hostname,
             http_path=http_path,
             access_token=access_token
-        ) as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(query)
-                return cursor.fetchall_arrow().to_pandas()
+        )
+
+    def ping(connection):
+        # A round trip that fails if the server has closed the session
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchall_arrow()
+
+    return ConnectionPool(
+        connect,
+        max_size=QUERY_WORKERS + POOL_RESERVE,
+        idle_timeout=float(getSetting("DATABRICKS_POOL_IDLE_TIMEOUT", 300)),
+        validate=ping,
+        validate_after=float(getSetting("DATABRICKS_POOL_VALIDATE_AFTER", 30)),
+    )
+
+
+@st.cache_resource
+def getQueryLog() -> QueryLog:
+    """Returns the process-wide rolling record of query executions (see the debug panel)."""
+    return QueryLog(maxlen=int(getSetting("DASHBOARD_QUERY_LOG_SIZE", 1000)))
+
+
+@st.cache_resource
+def getQueryExecutor() -> QueryExecutor:
+    """Returns the process-wide thread pool that runs warehouse queries concurrently."""
+    return QueryExecutor(
+        getConnectionPool(),
+        max_workers=QUERY_WORKERS,
+        timeout=float(getSetting("DASHBOARD_QUERY_TIMEOUT", 300)),
+        query_log=getQueryLog(),
+    )
+
+
+def sqlQueryArrow(query: str, parameters: dict = None, label: str = None, columns: list = None) -> pa.Table:
+    """Runs a SQL query on Databricks and returns the result as a PyArrow Table.
+
+    `parameters` are bound to the `:name` markers in the query by the connector. The
+    execution is recorded in the query log under `label`. A failed query returns an empty
+    table with the line-item `columns`, so callers can still select them.
+    """
+    try:
+        with tracing.span("sql_query", label=label):
+            return getQueryExecutor().execute(query, parameters, label=label)
 
     except Exception as e:
         st.error(f"Databricks connection error: {e}")
-        return pd.DataFrame()
+        return line_item_schema.empty_table(columns or [])
 
 
+def sqlQuery(query: str, parameters: dict = None, label: str = None) -> pd.DataFrame:
+    """Runs a SQL query on Databricks and returns the result as a Pandas DataFrame."""
+    return sqlQueryArrow(query, parameters, label).to_pandas()
+
+
+
+BATCH_SIZE = int(getSetting("DASHBOARD_BATCH_SIZE", 5000))
+
+# Number of date-range shards a line-item load is split into and loaded concurrently
+LOAD_SHARDS = int(getSetting("DASHBOARD_LOAD_SHARDS", 4))
+
+
+# "filtered" pushes the date range and category selection into the warehouse query;
+# "full" loads every line item once and filters in pandas.
+FETCH_MODE = getSetting("DASHBOARD_FETCH_MODE", "filtered")
 
-def getDataBatch(start_date, end_date, batch_size=5000):
-    offset = 0
-    all_data = pd.DataFrame()
-    
-    while True:
-        query = f"""
-            SELECT 
-                ug.id as user_group_id,
-                og.id as ordergroup_id,
-                og.project_id,
-                og.agreement as order_group_agreement,
-                og.code as order_group_code,
-                og.end_date as order_group_end_date,
-                og.is_delivery as order_group_is_delivery,
-                og.placement_details as order_group_placement_details,
-                og.removal_fee as order_group_removal_fee,
-                og.shift_count as order_group_shift_count,
-                og.start_date as order_group_start_date,
-                o.id as order_id,
-                o.accepted_on as order_accepted_on,
-                o.billing_comments_internal_use as order_billing_comments_internal_use,
-                o.code as order_code,
-                o.completed_on as order_completed_on,
-                o.created_on as order_created_on,
-                o.end_date as order_end_date,
-                o.schedule_window as order_schedule_window,
-                o.status as order_status,
-                o.submitted_on as order_submitted_on,
-                o.created_by_id as order_created_by,
-                o.submitted_by_id as submitted_by_id,
-                oli.id as orderline_id,
-                oli.backbill as orderline_backbill,
-                oli.is_flat_rate as orderline_is_flat_rate,
-                oli.paid as orderline_paid,
-                oli.quantity as orderline_quantity,
-                oli.rate as orderline_rate,
-                oli.rate * oli.quantity as order_line_total,
-                oli.platform_fee_percent as orderline_platform_fee_percent,
-                oli.tax as orderline_tax,
-                oli.stripe_invoice_line_item_id as stripe_invoice_line_item_id,
-                oli.order_line_item_type_id as orderline_type,
-                mp.name as main_product,
-                mpc.name as main_product_category,
-                mpcg.name as main_product_category_group,
-                ua.state as user_address_state,
-                u.is_staff as user_is_staff,
-                u.first_name as user_first_name,
-                u.last_name as user_last_name,
-                i.name as industry_name,
-                ug.name as user_group_name,
-                ug.account_owner_id as user_group_account_owner_id,
-                uo.first_name as account_owner_first_name,
-                uo.last_name as account_owner_last_name,
-                s.name as seller_name,
-                sl.name as seller_location_name,
-                olit.name as orderline_item_type_name
-            FROM bronze_prod.postgres_prod_restricted_bronze_public.api_orderlineitem oli
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_order o 
-                ON oli.order_id = o.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_ordergroup og 
-                ON o.order_group_id = og.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_sellerproductsellerlocation spsl
-                ON og.seller_product_seller_location_id = spsl.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_sellerproduct sp
-                ON spsl.seller_product_id = sp.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_product p 
-                ON sp.product_id = p.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_mainproduct mp 
-                ON p.main_product_id = mp.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_mainproductcategory mpc
-                ON mp.main_product_category_id = mpc.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_mainproductcategorygroup mpcg
-                ON mpc.group_id = mpcg.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_useraddress ua
-                ON og.user_address_id = ua.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_user u
-                ON o.created_by_id = u.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_usergroup ug
-                ON u.user_group_id = ug.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_seller s
-                ON sp.seller_id = s.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_usergroup ug_seller
-                ON s.id = ug_seller.seller_id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_user uo
-                ON ug.account_owner_id = uo.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_industry i
-                ON ug.industry_id = i.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_sellerlocation sl
-                ON spsl.seller_location_id = sl.id
-            LEFT JOIN bronze_prod.postgres_prod_restricted_bronze_public.api_orderlineitemtype olit
-                ON oli.order_line_item_type_id = olit.id
-            WHERE o.status IN ('COMPLETE', 'PENDING', 'SCHEDULED') 
-                AND o.status != 'CANCELLED'
-            LIMIT {batch_size} OFFSET {offset}
-        """
-        
-        batch_data = sqlQuery(query)
-        if batch_data.empty:
-            break
-        all_data = pd.concat([all_data, batch_data], ignore_index=True)
-        offset += batch_size
-    
-    return all_data
+
+# "warehouse" sends one GROUPING SETS query and downloads only the aggregates the widgets
+# read; "app" downloads the line items and aggregates them in pandas.
+AGGREGATION_MODE = getSetting("DASHBOARD_AGGREGATION_MODE", "app")
+
+
+# "incremental" keeps the previous frame per filter key and only fetches rows changed since
+# its watermark; "full" reloads everything whenever the cache expires.
+REFRESH_MODE = getSetting("DASHBOARD_REFRESH_MODE", "incremental")
+FULL_RELOAD_INTERVAL = float(getSetting("DASHBOARD_FULL_RELOAD_INTERVAL", 3600))
+
+def getDataBatch(start_date, end_date, categories=None, changed_since=None, columns=None, batch_size=BATCH_SIZE, on_batch=None):
+    """Loads the order line items, splitting the date range into shards loaded concurrently.
+
+    Every shard is a keyset-paginated loop (see `line_item_loader.load_shard`) running on the query executor,
+    so the load takes about as long as the slowest shard. Delta loads are small and are not
+    split. Pages stay Arrow record batches and are concatenated once, ordered by `oli.id`.
+    `start_date`, `end_date`, `categories` and `changed_since` narrow the query when given
+    (see `queries.build_filter_clause`). Only `columns` are selected, or every line-item column
+    when None (see `queries.build_select_list`). `on_batch(batch_number, rows_loaded)` is called
+    on the script thread while the shards load to report progress.
+    """
+    shards = [(start_date, end_date)] if changed_since is not None else split_date_range(start_date, end_date, LOAD_SHARDS)
+    progress = {"batches": 0, "rows": 0}
+    progress_lock = threading.Lock()
+
+    def on_page(rows):
+        with progress_lock:
+            progress["batches"] += 1
+            progress["rows"] += rows
+
+    executor = getQueryExecutor()
+    stop = threading.Event()
+    with tracing.span("load_line_items", shards=len(shards), delta=changed_since is not None) as attributes:
+        futures = [
+            executor.submit_task(
+                line_item_loader.load_shard, executor, shard_start, shard_end, categories, changed_since, columns, batch_size, on_page, stop
+            )
+            for shard_start, shard_end in shards
+        ]
+        pending = set(futures)
+        try:
+            while pending:
+                _, pending = wait(pending, timeout=0.5)
+                if on_batch is not None:
+                    with progress_lock:
+                        on_batch(progress["batches"], progress["rows"])
+        finally:
+            # A rerun interrupts the script thread (in `on_batch`) with a BaseException; the
+            # shards nobody will read are stopped instead of holding connections until done
+            if pending:
+                stop.set()
+                for future in pending:
+                    future.cancel()
+        attributes.update(progress)
+
+    batches = []
+    failures = []
+    for future in futures:
+        try:
+            batches.extend(future.result())
+        except Exception as e:
+            failures.append(e)
+
+    # A load missing some of its pages would be cached and merged as if it were complete
+    if failures:
+        rows = sum(batch.num_rows for batch in batches) + sum(getattr(e, "rows", 0) for e in failures)
+        getQueryLog().record_partial_load({
+            "shards": len(shards),
+            "failed_shards": len(failures),
+            "rows_discarded": rows,
+            "delta": changed_since is not None,
+            "errors": [str(e) for e in failures],
+        })
+        raise line_item_loader.PartialLoadError(
+            f"{len(failures)} of {len(shards)} line-item shards failed; {rows} loaded rows were discarded",
+            rows=rows,
+        ) from failures[0]
+
+    if not batches:
+        return line_item_schema.empty_table(LINE_ITEM_SELECT if columns is None else [name for name in LINE_ITEM_SELECT if name in columns])
+    data = pa.concat_tables(batches)
+    if len(shards) > 1:
+        data = data.sort_by('orderline_id')
+    with tracing.span("compact"):
+        compacted = line_item_schema.compact(data)
+    memory = line_item_schema.memory_report(data, compacted)
+    fanout = line_item_schema.fanout_report(compacted)
+    if fanout["duplicate_rows"]:
+        logger.warning("Line-item query returned more than one row per order line: %s", fanout)
+    getQueryLog().record_load({
+        **memory,
+        **fanout,
+        "delta": changed_since is not None,
+        "largest_columns": ", ".join(f"{name} {size:,} B" for name, size in memory["largest_columns"]),
+    })
+    return compacted
 
 st.set_page_config(layout="wide")
 
-@st.cache_data(ttl=30)  # only re-query if it's been 30 seconds
-def getData():
-    start_date = "2025-01-01"
-    end_date = datetime.now().strftime('%Y-%m-%d')
-    return getDataBatch(start_date, end_date)
+# Every full script run is one trace of named spans (see `tracing.span`), written to the log
+# as one JSON object per span unless DASHBOARD_TRACE_LOG is off
+if getFlag("DASHBOARD_TRACE_LOG", "true"):
+    tracing.log_spans()
+trace = tracing.start_trace("script_run", fetch_mode=FETCH_MODE, aggregation_mode=AGGREGATION_MODE)
+
+@st.cache_resource
+def getSnapshotStore() -> SnapshotStore:
+    """Returns the process-wide store of previously loaded frames used for delta refreshes."""
+    return SnapshotStore(full_reload_interval=FULL_RELOAD_INTERVAL)
+
+@st.cache_resource
+def getSharedCache():
+    """Returns the line-item cache shared by every replica, or None when DASHBOARD_SHARED_CACHE is unset.
+
+    The setting is a directory that all replicas mount, or "package.module:factory" for a
+    networked store with the same interface as `shared_cache.DiskStore`.
+    """
+    spec = getSetting("DASHBOARD_SHARED_CACHE", "")
+    if not spec:
+        return None
+    return SharedCache(
+        load_store(spec, max_entries=int(getSetting("DASHBOARD_SHARED_CACHE_SIZE", 32))),
+        ttl=float(getSetting("DASHBOARD_SHARED_CACHE_TTL", 30)),
+    )
 
-cli = getData()
+def loadData(key, on_batch=None):
+    """Loads the line items for `key`, a `(start_date, end_date, categories, columns)` tuple.
+
+    `columns` limits the fetch to those line-item columns; None fetches every column. With a
+    shared cache, only one replica at a time loads a given filter key from the warehouse.
+    """
+    start_date, end_date, categories, columns = key
+
+    def load():
+        if REFRESH_MODE == "incremental":
+            return getSnapshotStore().refresh(
+                key,
+                load_full=lambda: getDataBatch(start_date, end_date, categories, columns=columns, on_batch=on_batch),
+                load_delta=lambda since: getDataBatch(
+                    start_date, end_date, categories, changed_since=since, columns=columns, on_batch=on_batch
+                ),
+            )
+        return getDataBatch(start_date, end_date, categories, columns=columns, on_batch=on_batch)
+
+    shared_cache = getSharedCache()
+    if shared_cache is None:
+        return load()
+    with tracing.span("shared_cache"):
+        return shared_cache.get_or_load(cache_key("line_items", start_date, end_date, categories, columns), load)
+
+# Seconds between background reloads of the line items in use
+REFRESH_INTERVAL = float(getSetting("DASHBOARD_REFRESH_INTERVAL", 30))
+
+@st.cache_resource
+def getLineItemRefresher() -> BackgroundRefresher:
+    """Returns the process-wide refresher that keeps the line items of recent filter keys loaded."""
+    return BackgroundRefresher(
+        loadData,
+        interval=REFRESH_INTERVAL,
+        max_keys=int(getSetting("DASHBOARD_REFRESH_MAX_KEYS", 8)),
+        idle_timeout=float(getSetting("DASHBOARD_REFRESH_IDLE_TIMEOUT", 600)),
+        name="line_item_refresh",
+        version=line_item_schema.content_version,
+    )
+
+def loadDataWithProgress(key):
+    """Loads `key` like `loadData`, showing the progress of the load on the page."""
+    progress = st.empty()
+    report_progress = lambda batch_number, rows_loaded: progress.caption(
+        f"Loading order line items… {rows_loaded:,} rows in {batch_number} batches"
+    )
+    try:
+        return loadData(key, on_batch=report_progress)
+    finally:
+        progress.empty()
+
+# Line-item keys whose first load failed in this run -> the empty snapshot served for them, so
+# every section shows the same empty data and one error instead of retrying the load; the
+# script's globals start over on every run, which tries again
+failed_line_item_loads = {}
+
+def getLineItemSnapshot(start_date=None, end_date=None, categories=None, columns=None):
+    """Returns the last good line items for the given filters as a `background_refresh.Refreshed`.
+
+    Only the first request for a filter key waits for the load; later ones get the stored
+    snapshot at once while the refresher reloads it in the background. A first load that
+    fails shows an error and returns an empty table with the requested columns, which is not
+    stored, so the page still renders and the next run loads again.
+    """
+    key = (start_date, end_date, categories, columns)
+    if key in failed_line_item_loads:
+        return failed_line_item_loads[key]
+    try:
+        return getLineItemRefresher().get(key, load=loadDataWithProgress)
+    except line_item_loader.PartialLoadError as e:
+        st.error(f"Databricks connection error: {e.__cause__ or e}")
+        failed_at = time.time()
+        failed_line_item_loads[key] = Refreshed(
+            line_item_schema.empty_table(LINE_ITEM_SELECT if columns is None else columns),
+            failed_at,
+            version=("failed", failed_at),
+            failed_at=failed_at,
+            error=str(e),
+        )
+        return failed_line_item_loads[key]
+
+def getData(start_date=None, end_date=None, categories=None, columns=None):
+    """Returns the line items for the given filters, see `getLineItemSnapshot`."""
+    return getLineItemSnapshot(start_date, end_date, categories, columns).value
+
+@st.cache_data(ttl=3600)
+def getCategories():
+    """Returns the main product category names offered in the category filter."""
+    categories = sqlQuery("""
+        SELECT DISTINCT name
+        FROM bronze_prod.postgres_prod_restricted_bronze_public.api_mainproductcategory
+        WHERE name IS NOT NULL
+        ORDER BY name
+    """, label="categories")
+    return categories['name'].tolist() if not categories.empty else []
+
+@st.cache_data(ttl=30)
+def getWarehouseAggregates(start_date=None, end_date=None, categories=None):
+    """Runs the widget aggregations in the warehouse and returns one frame per grouping set."""
+    filter_clause, parameters = build_filter_clause(start_date, end_date, categories)
+    result = sqlQuery(aggregates.build_aggregate_query(filter_clause), parameters or None, label="aggregates")
+    if result.empty:
+        result = pd.DataFrame(columns=['grouping_id', *aggregates.DIMENSION_EXPRESSIONS, *aggregates.MEASURE_EXPRESSIONS])
+    return aggregates.split_aggregates(result)
+
+# Line-item columns each widget reads. Only their union is fetched for the dashboard; the
+# raw-data explorer below queries one page of its columns at a time.
+projection.register_widget("category_filter", ["main_product_category"])
+projection.register_widget("date_filter", ["order_end_date"])
+projection.register_widget("kpi_cards", ["order_id", "order_status", *metrics.NUMERIC_COLUMNS, "user_is_staff"])
+projection.register_widget("monthly_gmv", ["order_end_date", "order_status", *metrics.NUMERIC_COLUMNS])
+projection.register_widget("category_pie", ["main_product_category", "main_product_category_group"])
+projection.register_widget("category_sankey", ["main_product_category", "main_product_category_group"])
+projection.register_widget("monthly_ratios", ["order_id", "order_end_date", *metrics.NUMERIC_COLUMNS])
+projection.register_widget("buyer_averages", ["order_end_date", "user_group_id", *metrics.NUMERIC_COLUMNS])
+projection.register_widget("seller_location_averages", ["order_end_date", "seller_location_name", *metrics.NUMERIC_COLUMNS])
+projection.register_widget("industry_treemap", ["industry_name", "main_product_category", *metrics.NUMERIC_COLUMNS])
+projection.register_widget("industry_bubbles", ["order_id", "industry_name", "seller_location_name", *metrics.NUMERIC_COLUMNS])
+projection.register_widget("line_item_type_donuts", ["orderline_id", "orderline_item_type_name", *metrics.NUMERIC_COLUMNS])
+projection.register_widget(
+    "sales_rep_bars",
+    ["order_end_date", "order_status", "user_group_account_owner_id", "account_owner_first_name", "account_owner_last_name", *metrics.NUMERIC_COLUMNS],
+)
+# The monthly cube groups by every dimension, so the app-side aggregation needs all of them
+projection.register_widget("line_item_cube", aggregates.LINE_ITEM_COLUMNS)
+WIDGET_COLUMNS = projection.required_columns()
+
+@st.cache_data(ttl=30)
+def getKpis(start_date=None, end_date=None, categories=None):
+    """Returns the KPI card values from a single-row warehouse query."""
+    filter_clause, parameters = build_filter_clause(start_date, end_date, categories)
+    return aggregates.summarize_kpis(sqlQuery(aggregates.build_kpi_query(filter_clause), parameters or None, label="kpis"))
+
+def lineItemAggregates(cli, selected_categories, start, end):
+    """Filters the loaded line items by category and date and aggregates them for the widgets.
+
+    Returns the aggregates and the distinct order count of the category-filtered line items.
+    """
+    # A failed or empty load has nothing to filter or count
+    if cli.num_rows == 0:
+        empty = metrics.prepare_line_items(pd.DataFrame(columns=aggregates.LINE_ITEM_COLUMNS))
+        return aggregates.line_item_aggregates(empty), 0
+
+    with tracing.span("metrics.filter"):
+        # Filter data based on the selected categories
+        if 'All Categories' in selected_categories or not selected_categories:
+            category_data = cli
+        else:
+            category_data = arrow_filters.filter_categories(cli, selected_categories)
+
+        ##METRICS START HERE
+        # Count the distinct order_id values
+        distinct_order_count = arrow_filters.count_distinct(category_data, 'order_id')
+        ##METRICS END HERE
+
+        date_data = category_data
+        if start is not None and end is not None:
+            date_data = arrow_filters.filter_date_range(category_data, 'order_end_date', start, end)
+
+    # Only the rows in the date range and the columns the widgets read are converted to pandas
+    with tracing.span("metrics.to_pandas", rows=date_data.num_rows):
+        filtered_data = arrow_filters.to_pandas(date_data, aggregates.LINE_ITEM_COLUMNS)
+
+    # Coerce the numeric and date columns and derive customer/supplier amounts once
+    with tracing.span("metrics.prepare"):
+        filtered_data = metrics.prepare_line_items(filtered_data)
+    with tracing.span("metrics.aggregate"):
+        return aggregates.line_item_aggregates(filtered_data), distinct_order_count
+
+@st.cache_resource
+def getPayloadCache(kind) -> PayloadCache:
+    """Returns the process-wide memo of computed `kind` payloads ("aggregates" or "options")."""
+    return PayloadCache(
+        maxsize=int(getSetting("DASHBOARD_PAYLOAD_CACHE_SIZE", 256)),
+        ttl=float(getSetting("DASHBOARD_PAYLOAD_CACHE_TTL", 600)),
+    )
+
+@st.cache_data(ttl=30)
+def getDataVersion():
+    """Returns a value that changes whenever the orders change, to key memoized payloads."""
+    version = sqlQuery(DATA_VERSION_QUERY, label="data_version")
+    if version.empty:
+        # Without a version, payloads are only reused within the same 30 seconds
+        return ("unversioned", int(time.time() // 30))
+    return (str(version['watermark'].iloc[0]), int(version['order_count'].iloc[0]))
+
+def getDashboardAggregates(date_range=None, categories=None):
+    """Returns the widget aggregates and the distinct order count for the given filter values.
+
+    The aggregates come from the warehouse or from the line items, depending on the
+    aggregation mode; filters left out are not applied. Results are memoized per payload
+    version and filter values, so returning to an earlier filter state reuses them.
+    """
+    with tracing.span("dashboard_aggregates"):
+        return getPayloadCache("aggregates").get_or_compute(
+            (getPayloadVersion(date_range, categories), date_range, categories),
+            lambda: loadDashboardAggregates(date_range, categories),
+        )
+
+def loadDashboardAggregates(date_range=None, categories=None):
+    """Computes what `getDashboardAggregates` returns."""
+    start_date, end_date = date_range if date_range is not None else (None, None)
+    if AGGREGATION_MODE == "warehouse":
+        dashboard_aggregates = getWarehouseAggregates(start_date, end_date, categories)
+        return dashboard_aggregates, aggregates.summarize(dashboard_aggregates)['order_count']
+    line_items = getData(*lineItemKey(date_range, categories))
+    return lineItemAggregates(line_items, categories or [], start_date, end_date)
+
+def lineItemKey(date_range=None, categories=None):
+    """The line-item filter key the app-side aggregates for the given filter values are computed from."""
+    if FETCH_MODE == "filtered":
+        start_date, end_date = date_range if date_range is not None else (None, None)
+        return (start_date, end_date, categories, WIDGET_COLUMNS)
+    return (None, None, None, WIDGET_COLUMNS)
+
+def getPayloadVersion(date_range=None, categories=None):
+    """The version payloads for the given filter values are memoized under: the data version,
+    plus, when aggregating in the app, the version of the line-item snapshot they are computed
+    from, which only changes when a reload returned different rows."""
+    if AGGREGATION_MODE == "warehouse":
+        return getDataVersion()
+    return (getDataVersion(), getLineItemSnapshot(*lineItemKey(date_range, categories)).version)
+
+def getChartBudgets():
+    """The point budget of every chart: `chart_budget.DEFAULT_BUDGETS`, with the entries of the
+    DASHBOARD_CHART_BUDGETS setting (a JSON object or a secrets table) taking precedence."""
+    overrides = getSetting("DASHBOARD_CHART_BUDGETS", {})
+    if isinstance(overrides, str):
+        overrides = json.loads(overrides) if overrides.strip() else {}
+    return {**chart_budget.DEFAULT_BUDGETS, **{name: int(points) for name, points in dict(overrides).items()}}
+
+CHART_BUDGETS = getChartBudgets()
+
+# Option dicts larger than this are logged; the point budgets are what keeps them small
+CHART_MAX_BYTES = int(getSetting("DASHBOARD_CHART_MAX_BYTES", 200_000))
+
+def buildWithinBudget(section, build, filters, span):
+    """Calls `build(**filters)` and records the JSON size of each option dict on `span`."""
+    chart_options = build(**filters)
+    sizes = [chart_budget.payload_bytes(options) for options in chart_options]
+    span["payload_bytes"] = sizes
+    for i, size in enumerate(sizes):
+        if size > CHART_MAX_BYTES:
+            logger.warning("Chart %d of %s is %d bytes, over the %d byte budget", i, section, size, CHART_MAX_BYTES)
+    return chart_options
+
+def getChartOptions(section, filters, build):
+    """Returns the ECharts option dicts `build(**filters)` makes for `section`, memoized per
+    payload version and filter values."""
+    with tracing.span("chart", section=section) as span:
+        return getPayloadCache("options").get_or_compute(
+            (getPayloadVersion(**filters), section, tuple(sorted(filters.items()))),
+            lambda: buildWithinBudget(section, build, filters, span),
+        )
+
+def getCardValues(date_range=None, categories=None):
+    """Returns the KPI card values and the distinct order count for the given filter values."""
+    if FETCH_MODE == "filtered" or AGGREGATION_MODE == "warehouse":
+        start_date, end_date = date_range if date_range is not None else (None, None)
+        card_values = getKpis(start_date, end_date, categories)
+        return card_values, card_values['order_count']
+    dashboard_aggregates, distinct_order_count = getDashboardAggregates(date_range, categories)
+    return aggregates.summarize(dashboard_aggregates), distinct_order_count
+
+if FETCH_MODE != "filtered" and AGGREGATION_MODE != "warehouse":
+    cli = getData(columns=WIDGET_COLUMNS)
 
 st.header("Sales Performance Dashboard")
 
@@ -174,7 +554,13 @@ else:
 text_color = "white" if is_dark_mode() else "black"
 
 # Extract distinct values of main_product_category
-distinct_categories = cli['main_product_category'].dropna().unique().tolist()
+if FETCH_MODE == "filtered" or AGGREGATION_MODE == "warehouse":
+    distinct_categories = getCategories()
+    # An empty list means the query failed or found nothing; ask again on the next run
+    if not distinct_categories:
+        getCategories.clear()
+else:
+    distinct_categories = arrow_filters.distinct_values(cli, 'main_product_category')
 
 # Add a button to select all categories
 if st.button("Select All Categories"):
@@ -188,75 +574,6 @@ selected_categories = st.multiselect(
     key='selected_categories'
 )
 
-# Filter data based on the selected categories
-if 'All Categories' in selected_categories or not selected_categories:
-    filtered_data = cli
-else:
-    filtered_data = cli[cli['main_product_category'].isin(selected_categories)].copy()
-
-# Filter data based on the selected categories
-if 'All Categories' in selected_categories or not selected_categories:
-    filtered_data = cli
-else:
-    filtered_data = cli[cli['main_product_category'].isin(selected_categories)].copy()
-
-# Ensure 'order_line_total', 'supplier_amount', 'orderline_rate', 'orderline_quantity', and 'orderline_platform_fee_percent' are numeric
-filtered_data.loc[:, 'order_line_total'] = pd.to_numeric(filtered_data['order_line_total'], errors='coerce')
-if 'supplier_amount' in filtered_data.columns:
-    filtered_data.loc[:, 'supplier_amount'] = pd.to_numeric(filtered_data['supplier_amount'], errors='coerce')
-filtered_data.loc[:, 'orderline_rate'] = pd.to_numeric(filtered_data['orderline_rate'], errors='coerce')
-filtered_data.loc[:, 'orderline_quantity'] = pd.to_numeric(filtered_data['orderline_quantity'], errors='coerce')
-filtered_data.loc[:, 'orderline_platform_fee_percent'] = pd.to_numeric(filtered_data['orderline_platform_fee_percent'], errors='coerce')
-
-# Ensure 'order_end_date' is datetime
-filtered_data.loc[:, 'order_end_date'] = pd.to_datetime(filtered_data['order_end_date'], errors='coerce')
-
-# Drop duplicates based on 'order_id' and 'orderline_id'
-unique_data = filtered_data.drop_duplicates(subset=['order_id', 'orderline_id'])
-
-##METRICS START HERE
-
-# Calculate GMV (Customer Amount Complete)
-gmv = unique_data.loc[unique_data['order_status'] == 'COMPLETE'].apply(
-    lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent']) * 0.01), axis=1
-).sum()
-
-# Net Revenue
-net_revenue = unique_data.loc[unique_data['order_status'] == 'COMPLETE'].apply(
-    lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent']) * 0.01), axis=1
-).sum() - unique_data.loc[unique_data['order_status'] == 'COMPLETE'].apply(
-    lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']), axis=1
-).sum()
-# Calculate the sum of total_line_amount
-total_line_amount_sum = unique_data['order_line_total'].sum()
-
-# Count the distinct order_id values
-distinct_order_count = unique_data['order_id'].nunique()
-
-# Calculate Average Order Value
-average_order_value = unique_data.groupby('order_id').apply(
-    lambda x: (x['orderline_rate'] * x['orderline_quantity'] * (1 + x['orderline_platform_fee_percent'] * 0.01)).sum()
-).mean()
-
-# Calculate Take Rate
-customer_amount = unique_data.loc[unique_data['order_status'] == 'COMPLETE'].apply(
-    lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent'] * 0.01)), axis=1
-).sum()
-supplier_amount_complete = unique_data.loc[unique_data['order_status'] == 'COMPLETE'].apply(
-    lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']), axis=1
-).sum()
-take_rate = float((customer_amount - supplier_amount_complete) / customer_amount) if customer_amount != 0 else 0
-
-# Net Revenue Complete
-customer_amount_complete = unique_data.loc[unique_data['order_status'] == 'COMPLETE'].apply(
-    lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent']) * 0.01), axis=1
-).sum()
-supplier_amount_complete = unique_data.loc[unique_data['order_status'] == 'COMPLETE'].apply(
-    lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']), axis=1
-).sum()
-net_revenue_complete = customer_amount_complete - supplier_amount_complete
-##METRICS END HERE
-
 col1, col2, col3 = st.columns([1, 1, 2])
 with col1:
     st.markdown("Select Date Range")
@@ -279,14 +596,33 @@ with col1:
     else:
         start, end = st.session_state.date_range
 
-    filtered_data = filtered_data[(filtered_data['order_end_date'] >= start) & (filtered_data['order_end_date'] <= end)]
-    
+# Selecting every category is the same as no category filter, and keeps the cache key stable
+all_selected = 'All Categories' in selected_categories or set(selected_categories) >= set(distinct_categories)
+category_filter = tuple(sorted(selected_categories)) if selected_categories and not all_selected else None
+
+# Filter name -> current value. Every section below loads its own data from loaders that are
+# memoized per payload version and filter values, so a rerun with filters seen before reuses
+# the computed aggregates and chart options.
+dashboard_filters = {
+    "date_range": (pd.Timestamp(start).date(), pd.Timestamp(end).date()),
+    "categories": category_filter,
+}
+
+# Filled in at the end of the run, once the line items behind the charts are loaded
+data_freshness = st.empty()
+
+# The page is painted in stages. The KPI cards come first, from a single-row query (or from
+# the line items already loaded in full fetch mode); the charts fill in once their data is ready.
+def renderOrderCards(filters):
+    """Order count, line amount and distinct order count cards."""
+    filtered_metrics, distinct_order_count = getCardValues(**filters)
+
     # Create a card for Order Count
     st.markdown(
         f"""
         <div class="card">
             <div class="card-title" style="color: {text_color};">Total Order Count</div>
-            <div class="card-amount" style="color: {text_color};">{filtered_data.drop_duplicates(subset=['order_id'])['order_id'].nunique()}</div>
+            <div class="card-amount" style="color: {text_color};">{filtered_metrics['order_count']}</div>
         </div>
         """,
         unsafe_allow_html=True
@@ -296,7 +632,7 @@ with col1:
         f"""
         <div class="card">
             <div class="card-title" style="color: {text_color};">Total Line Amount</div>
-            <div class="card-amount" style="color: {text_color};">${filtered_data['order_line_total'].sum():,.2f}</div>
+            <div class="card-amount" style="color: {text_color};">${filtered_metrics['line_total']:,.2f}</div>
         </div>
         """,
         unsafe_allow_html=True
@@ -314,16 +650,12 @@ with col1:
     )
 
 
-with col2:
+def renderRevenueCards(filters):
+    """GMV, revenue, take rate and average order value cards."""
+    filtered_metrics, _ = getCardValues(**filters)
+
     # Create a card for Total GMV
-    # Calculate GMV for the filtered data
-    filtered_data.loc[:, 'orderline_rate'] = pd.to_numeric(filtered_data['orderline_rate'], errors='coerce')
-    filtered_data.loc[:, 'orderline_quantity'] = pd.to_numeric(filtered_data['orderline_quantity'], errors='coerce')
-    filtered_data.loc[:, 'orderline_platform_fee_percent'] = pd.to_numeric(filtered_data['orderline_platform_fee_percent'], errors='coerce')
-    
-    gmv_filtered = filtered_data.loc[filtered_data['order_status'] == 'COMPLETE'].apply(
-        lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent']) * 0.01), axis=1
-    ).sum()
+    gmv_filtered = filtered_metrics['gmv']
 
     st.markdown(
         f"""
@@ -336,14 +668,7 @@ with col2:
     )
     
     # Create a card for Total Revenue
-    # Calculate Net Revenue Complete for the filtered data
-    customer_amount_complete_filtered = filtered_data.loc[filtered_data['order_status'] == 'COMPLETE'].apply(
-        lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent']) * 0.01), axis=1
-    ).sum()
-    supplier_amount_complete_filtered = filtered_data.loc[filtered_data['order_status'] == 'COMPLETE'].apply(
-        lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']), axis=1
-    ).sum()
-    net_revenue_complete_filtered = customer_amount_complete_filtered - supplier_amount_complete_filtered
+    net_revenue_complete_filtered = filtered_metrics['net_revenue']
 
     st.markdown(
         f"""
@@ -355,14 +680,7 @@ with col2:
         unsafe_allow_html=True
     )
 
-    # Calculate Take Rate for the filtered data
-    customer_amount_filtered = filtered_data.loc[filtered_data['order_status'] == 'COMPLETE'].apply(
-        lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent']) * 0.01), axis=1
-    ).sum()
-    supplier_amount_filtered = filtered_data.loc[filtered_data['order_status'] == 'COMPLETE'].apply(
-        lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']), axis=1
-    ).sum()
-    take_rate_filtered = float((customer_amount_filtered - supplier_amount_filtered) / customer_amount_filtered) if customer_amount_filtered != 0 else 0
+    take_rate_filtered = filtered_metrics['take_rate']
 
     # Create a card for Take Rate
     st.markdown(
@@ -376,7 +694,7 @@ with col2:
     )
 
     # Create a card for Average Order Value
-    average_order_value = filtered_data['order_line_total'].sum() / filtered_data['order_id'].nunique() if filtered_data['order_id'].nunique() != 0 else 0
+    average_order_value = filtered_metrics['average_order_value']
     st.markdown(
         f"""
         <div class="card">
@@ -387,19 +705,24 @@ with col2:
         unsafe_allow_html=True
     )
 
-with col3:
-    # Prepare data for the bar chart showcasing GMV Completed and Net Revenue Completed month over month
-    filtered_data['order_end_date'] = pd.to_datetime(filtered_data['order_end_date'], errors='coerce')
-    filtered_data['month'] = filtered_data['order_end_date'].dt.to_period('M')
+with col1:
+    renderOrderCards(dashboard_filters)
 
-    gmv_completed_monthly = filtered_data.loc[filtered_data['order_status'] == 'COMPLETE'].groupby('month').apply(
-        lambda x: (x['orderline_rate'] * x['orderline_quantity'] * (1 + x['orderline_platform_fee_percent'] * 0.01)).sum()
-    ).reset_index(name='gmv_completed')
+with col2:
+    renderRevenueCards(dashboard_filters)
 
-    net_revenue_completed_monthly = filtered_data.loc[filtered_data['order_status'] == 'COMPLETE'].groupby('month').apply(
-        lambda x: (x['orderline_rate'] * x['orderline_quantity'] * (1 + x['orderline_platform_fee_percent'] * 0.01)).sum() - 
-                  (x['orderline_rate'] * x['orderline_quantity']).sum()
-    ).reset_index(name='net_revenue_completed')
+def buildMonthlyGmvOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderMonthlyGmv`, in the order they are rendered."""
+    dashboard_aggregates, _ = getDashboardAggregates(date_range, categories)
+    chart_options = []
+
+    # Additive monthly cube that the charts roll up from instead of rescanning the line items
+    line_item_cube = dashboard_aggregates['cube']
+
+    # Prepare data for the bar chart showcasing GMV Completed and Net Revenue Completed month over month
+    completed_monthly = chart_budget.coarsen_periods(metrics.totals_by(metrics.completed(line_item_cube), 'month'), 'month', CHART_BUDGETS['monthly_points'])
+    gmv_completed_monthly = completed_monthly.rename(columns={'gmv': 'gmv_completed'})
+    net_revenue_completed_monthly = completed_monthly.rename(columns={'net_revenue': 'net_revenue_completed'})
 
     # Calculate target line values (10% above GMV for each month)
     gmv_completed_monthly['target'] = gmv_completed_monthly['gmv_completed'] * 1.1
@@ -435,22 +758,30 @@ with col3:
         ]
     }
 
-    # Render the ECharts bar chart
-    st_echarts(options=gmv_chart_combination, height="400px")
-# sort by group
-# Create a row that spans both columns for sales dist and sales flow
-col2_3 = st.columns([2, 2])
-with col2_3[0]:
-    # Define the ECharts nested pie chart options
-    # Prepare data for the nested pie chart
-    gmv_data = filtered_data.groupby('main_product_category_group').apply(
-        lambda x: (x['orderline_rate'] * x['orderline_quantity'] * (1 + x['orderline_platform_fee_percent'] * 0.01)).sum()
-    ).reset_index(name='gmv')
+    chart_options.append(gmv_chart_combination)
+
+    return chart_options
+
+
+def renderMonthlyGmv(filters):
+    """GMV and net revenue of completed orders by month, next to the cards."""
+    # The first chart to need the full aggregates waits for them; later sections hit the cache
+    with st.spinner("Loading charts…"):
+        chart_options = getChartOptions("monthly_gmv", filters, buildMonthlyGmvOptions)
+    st_echarts(options=chart_options[0], height="400px")
 
-    net_revenue_data = filtered_data.groupby('main_product_category_group').apply(
-        lambda x: x['order_line_total'].sum() - x['supplier_amount'].sum() if 'supplier_amount' in x.columns else x['order_line_total'].sum()
-    ).reset_index(name='net_revenue')
+with col3:
+    renderMonthlyGmv(dashboard_filters)
+def buildCategoryMixOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderCategoryMix`, in the order they are rendered."""
+    dashboard_aggregates, _ = getDashboardAggregates(date_range, categories)
+    line_item_cube = dashboard_aggregates['cube']
+    chart_options = []
+
+    # Prepare data for the nested pie chart
+    category_group_totals = metrics.totals_by(line_item_cube, 'main_product_category_group')
 
+    # Define the ECharts nested pie chart options: net revenue inside, GMV in the outer ring
     nested_pie_options = {
         "title": {"text": "Sales Distribution", "left": "center"},
         "tooltip": {"trigger": "item"},
@@ -461,7 +792,7 @@ with col2_3[0]:
                 "selectedMode": "single",
                 "radius": [0, '50%'],
                 "label": {"position": "inner"},
-                "data": [{"value": row['net_revenue'], "name": row['main_product_category_group']} for _, row in net_revenue_data.iterrows()],
+                "data": chart_specs.records(category_group_totals, value='net_revenue', name='main_product_category_group'),
             },
             {
                 "name": "GMV",
@@ -469,23 +800,18 @@ with col2_3[0]:
                 "radius": ['60%', '75%'],
                 "labelLine": {"length": 10, "length2": 10},
                 "label": {"formatter": '{b}: {c} ({d}%)', "overflow": "truncate", "width": 100},
-                "data": [{"value": row['gmv'], "name": row['main_product_category_group']} for _, row in gmv_data.iterrows()],
+                "data": chart_specs.records(category_group_totals, value='gmv', name='main_product_category_group'),
             },
         ],
     }
 
-    # Render the ECharts nested pie chart
-    st_echarts(options=nested_pie_options, height="400px")
+    chart_options.append(nested_pie_options)
 
-with col2_3[1]:
     # Prepare data for the Sankey diagram
-    sankey_data = filtered_data.groupby(['main_product_category', 'main_product_category_group']).apply(
-        lambda x: (x['orderline_rate'] * x['orderline_quantity'] * (1 + x['orderline_platform_fee_percent'] * 0.01)).sum()
-    ).reset_index(name='gmv')
+    sankey_data = metrics.totals_by(line_item_cube, ['main_product_category', 'main_product_category_group'])
 
-    # Filter out small values to reduce clutter
-    threshold = sankey_data['gmv'].quantile(0.60)  # Keep only the top 40% of values
-    sankey_data_filtered = sankey_data[sankey_data['gmv'] >= threshold]
+    # Keep the largest categories and merge the rest into one "Other" node per group to reduce clutter
+    sankey_data_filtered = chart_budget.top_n(sankey_data, 'main_product_category', 'gmv', CHART_BUDGETS['sankey_links'])
 
     # Define the ECharts Sankey diagram options
     sankey_options = {
@@ -495,11 +821,8 @@ with col2_3[1]:
             {
                 "type": "sankey",
                 "layout": "none",
-                "data": [{"name": name} for name in pd.concat([sankey_data_filtered['main_product_category'], sankey_data_filtered['main_product_category_group']]).unique()],
-                "links": [
-                    {"source": row['main_product_category'], "target": row['main_product_category_group'], "value": row['gmv']}
-                    for _, row in sankey_data_filtered.iterrows()
-                ],
+                "data": chart_specs.nodes(sankey_data_filtered, ['main_product_category', 'main_product_category_group']),
+                "links": chart_specs.records(sankey_data_filtered, source='main_product_category', target='main_product_category_group', value='gmv'),
                 "label": {"show": True},  # Show labels to reduce clutter
                 "emphasis": {
                     "focus": "adjacency",
@@ -509,24 +832,31 @@ with col2_3[1]:
         ],
     }
 
-    # Render the ECharts Sankey diagram
-    st_echarts(options=sankey_options, height="400px")
-col1_2 = st.columns([2, 2])
-with col1_2[0]:
-    # Placeholder for the USA heatmap
-    st.markdown(
-        """
-        <div style="height: 400px; display: flex; align-items: center; justify-content: center;">
-            <p style="color: #888;">USA Heatmap Placeholder</p>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    chart_options.append(sankey_options)
+
+    return chart_options
+
+
+def renderCategoryMix(filters):
+    """GMV by category group and the category flow Sankey."""
+    chart_options = getChartOptions("category_mix", filters, buildCategoryMixOptions)
+    col2_3 = st.columns([2, 2])
+    with col2_3[0]:
+        st_echarts(options=chart_options[0], height="400px")
+
+    with col2_3[1]:
+        st_echarts(options=chart_options[1], height="400px")
+
+renderCategoryMix(dashboard_filters)
+
+def buildStaffOrdersOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderStaffOrders`, in the order they are rendered."""
+    filtered_metrics, _ = getCardValues(date_range, categories)
+    chart_options = []
 
-with col1_2[1]:
     # Calculate the percentage of orders made by non-staff users
-    total_orders = filtered_data['order_id'].nunique()
-    non_staff_orders = filtered_data[filtered_data['user_is_staff'] == False]['order_id'].nunique()
+    total_orders = filtered_metrics['order_count']
+    non_staff_orders = filtered_metrics['non_staff_order_count']
     non_staff_order_percentage = (non_staff_orders / total_orders) * 100 if total_orders != 0 else 0
 
     # Define the ECharts radial gauge options for Non-Staff Orders
@@ -549,175 +879,113 @@ with col1_2[1]:
         ]
     }
 
-    # Render the ECharts radial gauge for Non-Staff Orders
-    st_echarts(options=non_staff_orders_gauge_options, height="400px")
-    
-# Prepare data for the line charts
-
-
-monthly_avg_order_value = filtered_data.groupby('month').apply(
-    lambda x: round(x['order_line_total'].sum() / x['order_id'].nunique(), 2) if x['order_id'].nunique() != 0 else 0
-).reset_index(name='avg_order_value')
-
-monthly_avg_order_value['avg_order_value'] = monthly_avg_order_value['avg_order_value'].apply(lambda x: round(x, 2))
-
-monthly_avg_take_rate = filtered_data.groupby('month').apply(
-    lambda x: round((
-        x.apply(lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent']) * 0.01), axis=1).sum() -
-        x.apply(lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']), axis=1).sum()
-    ) / x.apply(lambda row: float(row['orderline_rate']) * float(row['orderline_quantity']) * (1 + float(row['orderline_platform_fee_percent']) * 0.01), axis=1).sum() if x.shape[0] > 0 else 0, 2)
-).reset_index(name='avg_take_rate')
-
-col1_2 = st.columns([2, 2])
-with col1_2[0]:
-    # Define the ECharts line chart options for Avg Take Rate by Month
-    avg_take_rate_options = {
-        "title": {"text": "Avg Take Rate by Month", "left": "center"},
-        "tooltip": {"trigger": "axis", "formatter": "{a} <br/>{b} : {c}%"},
-        "xAxis": {"type": "category", "data": monthly_avg_take_rate['month'].astype(str).tolist()},
-        "yAxis": {"type": "value", "axisLabel": {"formatter": "{value}%"}},
-        "series": [
-            {
-                "name": "Avg Take Rate",
-                "type": "line",
-                "data": (monthly_avg_take_rate['avg_take_rate'] * 100).tolist()
-            }
-        ]
-    }
+    chart_options.append(non_staff_orders_gauge_options)
 
-    # Render the ECharts line chart for Avg Take Rate by Month
-    st_echarts(options=avg_take_rate_options, height="400px")
+    return chart_options
 
-with col1_2[1]:
-    # Define the ECharts line chart options for Avg Order Value by Month
-    avg_order_value_options = {
-        "title": {"text": "Avg Order Value by Month", "left": "center"},
-        "tooltip": {"trigger": "axis"},
-        "xAxis": {"type": "category", "data": monthly_avg_order_value['month'].astype(str).tolist()},
-        "yAxis": {"type": "value"},
-        "series": [
-            {
-                "name": "Avg Order Value",
-                "type": "line",
-                "data": monthly_avg_order_value['avg_order_value'].tolist()
-            }
-        ]
-    }
 
-    # Render the ECharts line chart for Avg Order Value by Month
-    st_echarts(options=avg_order_value_options, height="400px")
+def renderStaffOrders(filters):
+    """USA heatmap placeholder and the non-staff orders gauge."""
+    chart_options = getChartOptions("staff_orders", filters, buildStaffOrdersOptions)
+    col1_2 = st.columns([2, 2])
+    with col1_2[0]:
+        # Placeholder for the USA heatmap
+        st.markdown(
+            """
+            <div style="height: 400px; display: flex; align-items: center; justify-content: center;">
+                <p style="color: #888;">USA Heatmap Placeholder</p>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-col3_4 = st.columns([2, 2])
-with col3_4[0]:
-    # Ensure 'month' column is in period format
-    filtered_data['month'] = filtered_data['order_end_date'].dt.to_period('M')
+    with col1_2[1]:
+        st_echarts(options=chart_options[0], height="400px")
 
-    # Group data by month and user group to calculate GMV and Net Revenue
-    monthly_user_group_data = filtered_data.groupby(['month', 'user_group_id']).apply(
-        lambda x: pd.Series({
-            'gmv': (x['orderline_rate'] * x['orderline_quantity'] * (1 + x['orderline_platform_fee_percent'] * 0.01)).sum(),
-            'net_revenue': x['order_line_total'].sum() - x['supplier_amount'].sum() if 'supplier_amount' in x.columns else x['order_line_total'].sum()
-        })
-    ).reset_index()
+renderStaffOrders(dashboard_filters)
 
-    # Calculate average GMV and Net Revenue per active buyer (user group) by month
-    monthly_avg_gmv = monthly_user_group_data.groupby('month')['gmv'].mean().reset_index(name='avg_gmv')
-    monthly_avg_net_revenue = monthly_user_group_data.groupby('month')['net_revenue'].mean().reset_index(name='avg_net_revenue')
+def buildMonthlyRatiosOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderMonthlyRatios`, in the order they are rendered."""
+    dashboard_aggregates, _ = getDashboardAggregates(date_range, categories)
+    chart_options = []
 
-    # Calculate the number of user groups per month
-    user_groups_per_month = monthly_user_group_data.groupby('month')['user_group_id'].nunique().reset_index(name='user_group_count')
+    # Prepare data for the line charts
+    # The ratios are computed after the monthly totals are merged, as ratios do not add up
+    monthly_totals = chart_budget.coarsen_periods(dashboard_aggregates['month'], 'month', CHART_BUDGETS['monthly_points'])
+    monthly_ratios = aggregates.monthly_ratios({**dashboard_aggregates, 'month': monthly_totals})
+    monthly_ratios = monthly_ratios.assign(avg_take_rate_percent=monthly_ratios['avg_take_rate'] * 100)
 
-    # Define the ECharts combination bar chart options
-    combo_bar_chart_options = {
-        "title": {"text": "Avg GMV and Net Revenue per Active Buyer by Month", "left": "center"},
-        "tooltip": {"trigger": "axis"},
-        "legend": {"data": ["Avg GMV", "Avg Net Revenue", "User Groups"], "left": "left"},
-        "xAxis": {
-            "type": "category",
-            "data": monthly_avg_gmv['month'].astype(str).tolist()
-        },
-        "yAxis": [
-            {"type": "value", "name": "Amount"},
-            {"type": "value", "name": "User Groups", "position": "right"}
-        ],
-        "series": [
-            {
-                "name": "Avg GMV",
-                "type": "bar",
-                "data": monthly_avg_gmv['avg_gmv'].tolist()
-            },
-            {
-                "name": "Avg Net Revenue",
-                "type": "bar",
-                "data": monthly_avg_net_revenue['avg_net_revenue'].tolist()
-            },
-            {
-                "name": "User Groups",
-                "type": "line",
-                "yAxisIndex": 1,
-                "data": user_groups_per_month['user_group_count'].tolist()
-            }
-        ]
-    }
+    chart_options.append(chart_specs.line_options("Avg Take Rate by Month", monthly_ratios, 'month', 'avg_take_rate_percent', "Avg Take Rate", percent=True))
+    chart_options.append(chart_specs.line_options("Avg Order Value by Month", monthly_ratios, 'month', 'avg_order_value', "Avg Order Value"))
 
-    # Render the ECharts combination bar chart
-    st_echarts(options=combo_bar_chart_options, height="400px")
+    return chart_options
 
-with col3_4[1]:
-    # Ensure 'month' column is in period format
-    filtered_data['month'] = filtered_data['order_end_date'].dt.to_period('M')
 
-    # Group data by month and seller location to calculate GMV and Net Revenue
-    monthly_seller_location_data = filtered_data.groupby(['month', 'seller_location_name']).apply(
-        lambda x: pd.Series({
-            'gmv': (x['orderline_rate'] * x['orderline_quantity'] * (1 + x['orderline_platform_fee_percent'] * 0.01)).sum(),
-            'net_revenue': x['order_line_total'].sum() - x['supplier_amount'].sum() if 'supplier_amount' in x.columns else x['order_line_total'].sum()
-        })
+def renderMonthlyRatios(filters):
+    """Average take rate and average order value by month."""
+    chart_options = getChartOptions("monthly_ratios", filters, buildMonthlyRatiosOptions)
+    col1_2 = st.columns([2, 2])
+    with col1_2[0]:
+        st_echarts(options=chart_options[0], height="400px")
+
+    with col1_2[1]:
+        st_echarts(options=chart_options[1], height="400px")
+
+renderMonthlyRatios(dashboard_filters)
+
+def buildAveragesOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderAverages`, in the order they are rendered."""
+    dashboard_aggregates, _ = getDashboardAggregates(date_range, categories)
+    line_item_cube = dashboard_aggregates['cube']
+    chart_options = []
+
+    # Average GMV and net revenue per active buyer (user group), and the number of buyers, by month
+    monthly_user_group_data = metrics.totals_by(dashboard_aggregates['month_user_group'], ['month', 'user_group_id'])
+    monthly_user_group_averages = monthly_user_group_data.groupby('month').agg(
+        avg_gmv=('gmv', 'mean'),
+        avg_net_revenue=('net_revenue', 'mean'),
+        user_group_count=('user_group_id', 'nunique'),
     ).reset_index()
 
-    # Calculate average GMV and Net Revenue per active seller location by month
-    monthly_avg_gmv_seller = monthly_seller_location_data.groupby('month')['gmv'].mean().reset_index(name='avg_gmv')
-    monthly_avg_net_revenue_seller = monthly_seller_location_data.groupby('month')['net_revenue'].mean().reset_index(name='avg_net_revenue')
+    chart_options.append(chart_specs.bar_line_options(
+        "Avg GMV and Net Revenue per Active Buyer by Month",
+        monthly_user_group_averages,
+        'month',
+        bars=[("Avg GMV", 'avg_gmv'), ("Avg Net Revenue", 'avg_net_revenue')],
+        line=("User Groups", 'user_group_count'),
+    ))
+
+    # Average GMV and net revenue per active seller location, and the number of locations, by month
+    monthly_seller_location_data = metrics.totals_by(line_item_cube, ['month', 'seller_location_name'])
+    monthly_seller_location_averages = monthly_seller_location_data.groupby('month').agg(
+        avg_gmv=('gmv', 'mean'),
+        avg_net_revenue=('net_revenue', 'mean'),
+        seller_location_count=('seller_location_name', 'nunique'),
+    ).reset_index()
 
-    # Calculate the number of active seller locations per month
-    seller_locations_per_month = monthly_seller_location_data.groupby('month')['seller_location_name'].nunique().reset_index(name='seller_location_count')
+    chart_options.append(chart_specs.bar_line_options(
+        "Avg GMV and Net Revenue per Active Seller Location by Month",
+        monthly_seller_location_averages,
+        'month',
+        bars=[("Avg GMV", 'avg_gmv'), ("Avg Net Revenue", 'avg_net_revenue')],
+        line=("Seller Locations", 'seller_location_count'),
+        line_axis={"axisLabel": {"show": False}, "axisLine": {"show": False}, "axisTick": {"show": False}},
+    ))
 
-    # Define the ECharts combination bar chart options for active seller locations
-    combo_bar_chart_options_seller = {
-        "title": {"text": "Avg GMV and Net Revenue per Active Seller Location by Month", "left": "center"},
-        "tooltip": {"trigger": "axis"},
-        "legend": {"data": ["Avg GMV", "Avg Net Revenue", "Seller Locations"], "left": "left"},
-        "xAxis": {
-            "type": "category",
-            "data": monthly_avg_gmv_seller['month'].astype(str).tolist()
-        },
-        "yAxis": [
-            {"type": "value", "name": "Amount"},
-            {"type": "value", "name": "Seller Locations", "position": "right", "axisLabel": {"show": False}, "axisLine": {"show": False}, "axisTick": {"show": False}}
-        ],
-        "series": [
-            {
-                "name": "Avg GMV",
-                "type": "bar",
-                "data": monthly_avg_gmv_seller['avg_gmv'].tolist()
-            },
-            {
-                "name": "Avg Net Revenue",
-                "type": "bar",
-                "data": monthly_avg_net_revenue_seller['avg_net_revenue'].tolist()
-            },
-            {
-                "name": "Seller Locations",
-                "type": "line",
-                "yAxisIndex": 1,
-                "data": seller_locations_per_month['seller_location_count'].tolist(),
+    return chart_options
 
-            }
-        ]
-    }
 
-    # Render the ECharts combination bar chart for active seller locations
-    st_echarts(options=combo_bar_chart_options_seller, height="400px")
+def renderAverages(filters):
+    """Average GMV and net revenue per buyer and per seller location by month."""
+    chart_options = getChartOptions("averages", filters, buildAveragesOptions)
+    col3_4 = st.columns([2, 2])
+    with col3_4[0]:
+        st_echarts(options=chart_options[0], height="400px")
+
+    with col3_4[1]:
+        st_echarts(options=chart_options[1], height="400px")
+
+renderAverages(dashboard_filters)
 
 col_full = st.columns([1])
 with col_full[0]:
@@ -730,28 +998,18 @@ with col_full[0]:
         """,
         unsafe_allow_html=True
     )
-col_full_2 = st.columns([1])
-with col_full_2[0]:
-    # Prepare data for the treemap
-    treemap_data = filtered_data.groupby(['industry_name', 'main_product_category']).agg({
-        'orderline_rate': 'sum',
-        'orderline_quantity': 'sum',
-        'orderline_platform_fee_percent': 'mean'
-    }).reset_index()
-
-    treemap_data['gmv'] = treemap_data.apply(
-        lambda row: round(row['orderline_rate'] * row['orderline_quantity'] * (1 + row['orderline_platform_fee_percent'] * 0.01), 2), axis=1
-    )
+def buildIndustryTreemapOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderIndustryTreemap`, in the order they are rendered."""
+    dashboard_aggregates, _ = getDashboardAggregates(date_range, categories)
+    line_item_cube = dashboard_aggregates['cube']
+    chart_options = []
 
     # Prepare data for the treemap
-    treemap_data_grouped = treemap_data.groupby('industry_name').apply(
-        lambda x: [{"name": row['main_product_category'], "value": row['gmv']} for _, row in x.iterrows()]
-    ).reset_index(name='children')
+    treemap_data = metrics.totals_by(line_item_cube, ['industry_name', 'main_product_category'])
+    treemap_data = chart_budget.top_n(treemap_data, 'main_product_category', 'gmv', CHART_BUDGETS['treemap_categories_per_industry'], within='industry_name')
+    treemap_data['gmv'] = treemap_data['gmv'].round(2)
 
-    treemap_data_final = [
-        {"name": industry, "children": children}
-        for industry, children in treemap_data_grouped.values
-    ]
+    treemap_data_final = chart_specs.tree(treemap_data, 'industry_name', 'main_product_category', 'gmv')
 
     # Define the ECharts treemap options
     treemap_options = {
@@ -798,230 +1056,348 @@ with col_full_2[0]:
         ]
     }
 
-    # Render the ECharts treemap
-    st_echarts(options=treemap_options, height="600px")
+    chart_options.append(treemap_options)
 
-col_new = st.columns([2, 2])
-with col_new[0]:
-    # Prepare data for the bubble chart
-    bubble_data = filtered_data.groupby('industry_name').agg({
-        'order_id': 'nunique',
-        'orderline_rate': 'sum',
-        'orderline_quantity': 'sum',
-        'orderline_platform_fee_percent': 'mean'
-    }).reset_index()
-
-    bubble_data['gmv'] = bubble_data.apply(
-        lambda row: round(row['orderline_rate'] * row['orderline_quantity'] * (1 + row['orderline_platform_fee_percent'] * 0.01), 2), axis=1
-    )
+    return chart_options
 
-    bubble_chart_options = {
-        "title": {"text": "Total GMV vs User Count by Industry", "left": "center"},
-        "tooltip": {"trigger": "item", "formatter": "{a} <br/>{b} : {c}"},
-        "xAxis": {"type": "category", "data": bubble_data['industry_name'].tolist()},
-        "yAxis": {"type": "value", "name": "Total GMV"},
-        "series": [
-            {
-                "name": "GMV vs User Count",
-                "type": "scatter",
-                "symbolSize": 20,
-                "data": bubble_data.apply(lambda row: [row['industry_name'], row['gmv'], row['order_id']], axis=1).tolist()
-            }
-        ]
-    }
 
-    # Render the ECharts bubble chart
-    st_echarts(options=bubble_chart_options, height="400px")
+def renderIndustryTreemap(filters):
+    """GMV treemap by industry and product category."""
+    chart_options = getChartOptions("industry_treemap", filters, buildIndustryTreemapOptions)
+    col_full_2 = st.columns([1])
+    with col_full_2[0]:
+        st_echarts(options=chart_options[0], height="600px")
+
+renderIndustryTreemap(dashboard_filters)
+
+def buildIndustryBubblesOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderIndustryBubbles`, in the order they are rendered."""
+    dashboard_aggregates, _ = getDashboardAggregates(date_range, categories)
+    chart_options = []
 
-with col_new[1]:
     # Prepare data for the bubble chart
-    bubble_data = filtered_data.groupby(['industry_name', 'seller_location_name']).agg({
-        'order_id': 'nunique',
-        'orderline_rate': 'sum',
-        'orderline_quantity': 'sum',
-        'orderline_platform_fee_percent': 'mean'
-    }).reset_index()
-
-    bubble_data['gmv'] = bubble_data.apply(
-        lambda row: round(row['orderline_rate'] * row['orderline_quantity'] * (1 + row['orderline_platform_fee_percent'] * 0.01), 2), axis=1
-    )
+    bubble_data = dashboard_aggregates['industry'].rename(columns={'customer_amount': 'gmv'})
+    bubble_data = chart_budget.top_n(bubble_data, 'industry_name', 'gmv', CHART_BUDGETS['industry_bubbles'])
+    bubble_data['gmv'] = bubble_data['gmv'].round(2)
 
-    bubble_chart_options = {
-        "title": {"text": "Total GMV vs Seller Location Count by User Group Industry", "left": "center"},
-        "tooltip": {"trigger": "item", "formatter": "{a} <br/>{b} : {c}"},
-        "xAxis": {"type": "category", "data": bubble_data['industry_name'].tolist()},
-        "yAxis": {"type": "value", "name": "Total GMV"},
-        "series": [
-            {
-                "name": "GMV vs Seller Location Count",
-                "type": "scatter",
-                "symbolSize": 20,
-                "data": bubble_data.apply(lambda row: [row['industry_name'], row['gmv'], row['order_id']], axis=1).tolist()
-            }
-        ]
-    }
+    chart_options.append(chart_specs.scatter_options(
+        "Total GMV vs User Count by Industry", "GMV vs User Count",
+        bubble_data, 'industry_name', 'gmv', 'order_count', y_name="Total GMV",
+    ))
 
-    # Render the ECharts bubble chart
-    st_echarts(options=bubble_chart_options, height="400px")
-    
-    
-col_new_row = st.columns([1, 1, 1])
-with col_new_row[0]:
-    # Prepare data for the donut chart
-    donut_data = filtered_data.groupby('orderline_item_type_name').apply(
-        lambda x: (x['orderline_rate'] * x['orderline_quantity'] * (1 + x['orderline_platform_fee_percent'] * 0.01)).sum()
-    ).reset_index(name='gmv')
-
-    # Define the ECharts donut chart options
-    donut_chart_options = {
-        "title": {"text": "GMV by Order Line Item Type", "left": "center"},
-        "tooltip": {"trigger": "item", "formatter": "{a} <br/>{b} : {c} ({d}%)"},
-        "legend": {"orient": "vertical", "left": "left", "data": donut_data['orderline_item_type_name'].tolist()},
-        "series": [
-            {
-                "name": "Order Line Item Type",
-                "type": "pie",
-                "radius": ["40%", "70%"],
-                "avoidLabelOverlap": False,
-                "label": {"show": False, "position": "center"},
-                "emphasis": {
-                    "label": {"show": True, "fontSize": "20", "fontWeight": "bold"}
-                },
-                "labelLine": {"show": False},
-                "data": [{"value": row['gmv'], "name": row['orderline_item_type_name']} for _, row in donut_data.iterrows()]
-            }
-        ]
-    }
+    # Prepare data for the bubble chart
+    bubble_data = dashboard_aggregates['industry_seller_location'].rename(columns={'customer_amount': 'gmv'})
+    bubble_data = chart_budget.top_n(bubble_data, 'seller_location_name', 'gmv', CHART_BUDGETS['seller_location_bubbles_per_industry'], within='industry_name')
+    bubble_data['gmv'] = bubble_data['gmv'].round(2)
 
-    # Render the ECharts donut chart
-    st_echarts(options=donut_chart_options, height="400px")
+    chart_options.append(chart_specs.scatter_options(
+        "Total GMV vs Seller Location Count by User Group Industry", "GMV vs Seller Location Count",
+        bubble_data, 'industry_name', 'gmv', 'order_count', y_name="Total GMV",
+    ))
 
-with col_new_row[1]:
-    # Prepare data for the donut chart showcasing orderline_type by count
-    orderline_type_count = filtered_data['orderline_item_type_name'].value_counts().reset_index()
-    orderline_type_count.columns = ['orderline_item_type_name', 'count']
+    return chart_options
 
-    # Define the ECharts donut chart options
-    donut_chart_options_orderline_type = {
-        "title": {"text": "Order Line Item Type by Count", "left": "center"},
-        "tooltip": {"trigger": "item", "formatter": "{a} <br/>{b} : {c} ({d}%)"},
-        "legend": {"orient": "vertical", "left": "left", "data": orderline_type_count['orderline_item_type_name'].tolist()},
-        "series": [
-            {
-                "name": "Order Line Item Type",
-                "type": "pie",
-                "radius": ["40%", "70%"],
-                "avoidLabelOverlap": False,
-                "label": {"show": False, "position": "center"},
-                "emphasis": {
-                    "label": {"show": True, "fontSize": "20", "fontWeight": "bold"}
-                },
-                "labelLine": {"show": False},
-                "data": [{"value": row['count'], "name": row['orderline_item_type_name']} for _, row in orderline_type_count.iterrows()]
-            }
-        ]
-    }
 
-    # Render the ECharts donut chart
-    st_echarts(options=donut_chart_options_orderline_type, height="400px")
+def renderIndustryBubbles(filters):
+    """Order count and GMV bubbles per industry."""
+    chart_options = getChartOptions("industry_bubbles", filters, buildIndustryBubblesOptions)
+    col_new = st.columns([2, 2])
+    with col_new[0]:
+        st_echarts(options=chart_options[0], height="400px")
 
-with col_new_row[2]:
-    # Prepare data for the donut chart showcasing orderline_item by net revenue
-    orderline_net_revenue = filtered_data.groupby('orderline_item_type_name').apply(
-        lambda x: x['order_line_total'].sum() - x['supplier_amount'].sum() if 'supplier_amount' in x.columns else x['order_line_total'].sum()
-    ).reset_index(name='net_revenue')
+    with col_new[1]:
+        st_echarts(options=chart_options[1], height="400px")
 
-    # Define the ECharts donut chart options
-    donut_chart_options_orderline_net_revenue = {
-        "title": {"text": "Net Revenue by Order Line Item Type", "left": "center"},
-        "tooltip": {"trigger": "item", "formatter": "{a} <br/>{b} : {c} ({d}%)"},
-        "legend": {"orient": "vertical", "left": "left", "data": orderline_net_revenue['orderline_item_type_name'].tolist()},
-        "series": [
-            {
-                "name": "Order Line Item Type",
-                "type": "pie",
-                "radius": ["40%", "70%"],
-                "avoidLabelOverlap": False,
-                "label": {"show": False, "position": "center"},
-                "emphasis": {
-                    "label": {"show": True, "fontSize": "20", "fontWeight": "bold"}
-                },
-                "labelLine": {"show": False},
-                "data": [{"value": row['net_revenue'], "name": row['orderline_item_type_name']} for _, row in orderline_net_revenue.iterrows()]
-            }
-        ]
-    }
+renderIndustryBubbles(dashboard_filters)
 
-    # Render the ECharts donut chart
-    st_echarts(options=donut_chart_options_orderline_net_revenue, height="400px")
-    
-col_last_row = st.columns([1, 1])
-with col_last_row[0]:
-    # Group by account_owner_id and year_month, then sum customer_amount_complete
-    gmv_per_sales_rep = filtered_data.loc[filtered_data['order_status'] == 'COMPLETE'].groupby(['user_group_account_owner_id', 'month'], as_index=False)['order_line_total'].sum()
+def buildLineItemTypesOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderLineItemTypes`, in the order they are rendered."""
+    dashboard_aggregates, _ = getDashboardAggregates(date_range, categories)
+    line_item_cube = dashboard_aggregates['cube']
+    chart_options = []
 
-    # Translate account_owner_id to actual name
-    gmv_per_sales_rep = gmv_per_sales_rep.merge(filtered_data[['user_group_account_owner_id', 'account_owner_first_name', 'account_owner_last_name']].drop_duplicates(), left_on='user_group_account_owner_id', right_on='user_group_account_owner_id', how='left')
-    gmv_per_sales_rep['full_name'] = gmv_per_sales_rep['account_owner_first_name'] + ' ' + gmv_per_sales_rep['account_owner_last_name']
-    gmv_per_sales_rep.drop(columns=['user_group_account_owner_id', 'account_owner_first_name', 'account_owner_last_name'], inplace=True)
-    gmv_per_sales_rep.rename(columns={'order_line_total': 'gmv'}, inplace=True)
+    # GMV and net revenue per line item type
+    line_item_type_totals = metrics.totals_by(line_item_cube, 'orderline_item_type_name')
 
-    # Define the ECharts bar chart options
-    bar_chart_options_sales_rep = {
-        "title": {"text": "GMV per Sales-Rep Month by Month", "left": "center", "top": "5%"},
-        "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
-        "legend": {"data": gmv_per_sales_rep['full_name'].unique().tolist(), "left": "left"},
-        "xAxis": {
-            "type": "category",
-            "data": gmv_per_sales_rep['month'].astype(str).unique().tolist()
-        },
-        "yAxis": {"type": "value", "name": "GMV"},
-        "series": [
-            {
-                "name": sales_rep,
-                "type": "bar",
-                "stack": "total",
-                "data": gmv_per_sales_rep[gmv_per_sales_rep['full_name'] == sales_rep]['gmv'].round(2).tolist()
-            } for sales_rep in gmv_per_sales_rep['full_name'].unique()
-        ]
-    }
+    # Line count per line item type, largest first
+    orderline_type_count = cube.roll_up(line_item_cube, 'orderline_item_type_name', measures=['line_count'])
+    orderline_type_count = orderline_type_count.rename(columns={'line_count': 'count'}).sort_values('count', ascending=False)
 
-    # Render the ECharts bar chart
-    st_echarts(options=bar_chart_options_sales_rep, height="400px")
+    chart_options.append(chart_specs.donut_options("GMV by Order Line Item Type", line_item_type_totals, 'orderline_item_type_name', 'gmv', "Order Line Item Type"))
+    chart_options.append(chart_specs.donut_options("Order Line Item Type by Count", orderline_type_count, 'orderline_item_type_name', 'count', "Order Line Item Type"))
+    chart_options.append(chart_specs.donut_options("Net Revenue by Order Line Item Type", line_item_type_totals, 'orderline_item_type_name', 'net_revenue', "Order Line Item Type"))
 
-with col_last_row[1]:
-    # Prepare data for the bar chart showcasing Net Revenue per sales-rep month by month
-    net_revenue_per_sales_rep = filtered_data.groupby(['month', 'account_owner_first_name', 'account_owner_last_name']).apply(
-        lambda x: x['order_line_total'].sum() - x['supplier_amount'].sum() if 'supplier_amount' in x.columns else x['order_line_total'].sum()
-    ).reset_index(name='net_revenue')
+    return chart_options
 
-    # Combine first and last names to create full names
-    net_revenue_per_sales_rep['full_name'] = net_revenue_per_sales_rep['account_owner_first_name'] + ' ' + net_revenue_per_sales_rep['account_owner_last_name']
 
-    # Define the ECharts bar chart options
-    bar_chart_options_net_revenue = {
-        "title": {"text": "Net Revenue per Sales-Rep Month by Month", "left": "center", "top": "5%"},
-        "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
-        "legend": {"data": net_revenue_per_sales_rep['full_name'].unique().tolist(), "left": "left"},
-        "xAxis": {
-            "type": "category",
-            "data": net_revenue_per_sales_rep['month'].astype(str).unique().tolist()
-        },
-        "yAxis": {"type": "value", "name": "Net Revenue"},
-        "series": [
-            {
-                "name": sales_rep,
-                "type": "bar",
-                "stack": "total",
-                "data": net_revenue_per_sales_rep[net_revenue_per_sales_rep['full_name'] == sales_rep]['net_revenue'].round(2).tolist()
-            } for sales_rep in net_revenue_per_sales_rep['full_name'].unique()
-        ]
-    }
+def renderLineItemTypes(filters):
+    """Line item type donuts."""
+    chart_options = getChartOptions("line_item_types", filters, buildLineItemTypesOptions)
+    col_new_row = st.columns([1, 1, 1])
+    with col_new_row[0]:
+        st_echarts(options=chart_options[0], height="400px")
+
+    with col_new_row[1]:
+        st_echarts(options=chart_options[1], height="400px")
 
-    # Render the ECharts bar chart
-    st_echarts(options=bar_chart_options_net_revenue, height="400px")
-# Limit the number of rows displayed in the DataFrame
-st.dataframe(data=cli, height=600, use_container_width=True)
+    with col_new_row[2]:
+        st_echarts(options=chart_options[2], height="400px")
 
+renderLineItemTypes(dashboard_filters)
 
+def buildSalesRepsOptions(date_range=None, categories=None):
+    """Builds the ECharts options of `renderSalesReps`, in the order they are rendered."""
+    dashboard_aggregates, _ = getDashboardAggregates(date_range, categories)
+    line_item_cube = dashboard_aggregates['cube']
+    chart_options = []
 
+    # Group by account_owner_id and year_month, then sum customer_amount_complete
+    gmv_per_sales_rep = cube.roll_up(metrics.completed(line_item_cube), ['user_group_account_owner_id', 'month'], measures=['customer_amount'])
+
+    # Translate account_owner_id to actual name
+    gmv_per_sales_rep = gmv_per_sales_rep.merge(line_item_cube[['user_group_account_owner_id', 'account_owner_first_name', 'account_owner_last_name']].drop_duplicates(), left_on='user_group_account_owner_id', right_on='user_group_account_owner_id', how='left')
+    gmv_per_sales_rep['full_name'] = gmv_per_sales_rep['account_owner_first_name'].astype(object) + ' ' + gmv_per_sales_rep['account_owner_last_name'].astype(object)
+    gmv_per_sales_rep.drop(columns=['user_group_account_owner_id', 'account_owner_first_name', 'account_owner_last_name'], inplace=True)
+    gmv_per_sales_rep.rename(columns={'customer_amount': 'gmv'}, inplace=True)
+    gmv_per_sales_rep = chart_budget.top_n(gmv_per_sales_rep, 'full_name', 'gmv', CHART_BUDGETS['sales_rep_series'])
+    gmv_per_sales_rep['gmv'] = gmv_per_sales_rep['gmv'].round(2)
+
+    chart_options.append(chart_specs.stacked_bar_options("GMV per Sales-Rep Month by Month", gmv_per_sales_rep, 'month', 'full_name', 'gmv', y_name="GMV"))
+
+    # Prepare data for the bar chart showcasing Net Revenue per sales-rep month by month
+    net_revenue_per_sales_rep = metrics.totals_by(line_item_cube, ['month', 'account_owner_first_name', 'account_owner_last_name'])
+
+    # Combine first and last names to create full names
+    net_revenue_per_sales_rep['full_name'] = net_revenue_per_sales_rep['account_owner_first_name'].astype(object) + ' ' + net_revenue_per_sales_rep['account_owner_last_name'].astype(object)
+    net_revenue_per_sales_rep = chart_budget.top_n(net_revenue_per_sales_rep.drop(columns=['account_owner_first_name', 'account_owner_last_name']), 'full_name', 'net_revenue', CHART_BUDGETS['sales_rep_series'])
+    net_revenue_per_sales_rep['net_revenue'] = net_revenue_per_sales_rep['net_revenue'].round(2)
+
+    chart_options.append(chart_specs.stacked_bar_options("Net Revenue per Sales-Rep Month by Month", net_revenue_per_sales_rep, 'month', 'full_name', 'net_revenue', y_name="Net Revenue"))
+
+    return chart_options
+
+
+def renderSalesReps(filters):
+    """GMV and net revenue per sales rep by month."""
+    chart_options = getChartOptions("sales_reps", filters, buildSalesRepsOptions)
+    col_last_row = st.columns([1, 1])
+    with col_last_row[0]:
+        st_echarts(options=chart_options[0], height="400px")
+
+    with col_last_row[1]:
+        st_echarts(options=chart_options[1], height="400px")
+
+renderSalesReps(dashboard_filters)
+
+@st.cache_data(ttl=30)
+def getRawLineItemCount(start_date=None, end_date=None, categories=None, search_column=None, search_text=""):
+    """Counts the line items matching the dashboard filters and the explorer search."""
+    filter_clause, parameters = build_filter_clause(start_date, end_date, categories)
+    search_clause, search_parameters = build_search_clause(search_column, search_text)
+    result = sqlQueryArrow(build_count_query(f"{filter_clause}\n    {search_clause}"), {**parameters, **search_parameters} or None, label="raw_count")
+    return result['line_count'][0].as_py() if result.num_rows else 0
+
+@st.cache_data(ttl=30)
+def getRawLineItemPage(start_date=None, end_date=None, categories=None, columns=None, sort_by=None, descending=False,
+                       search_column=None, search_text="", page=1, page_size=100):
+    """Loads one page of line items; sorting, search and paging all run in the warehouse."""
+    filter_clause, parameters = build_filter_clause(start_date, end_date, categories)
+    search_clause, search_parameters = build_search_clause(search_column, search_text)
+    query = build_page_query(
+        columns, f"{filter_clause}\n    {search_clause}", sort_by, descending, limit=page_size, offset=(page - 1) * page_size
+    )
+    return sqlQueryArrow(query, {**parameters, **search_parameters} or None, label="raw_page", columns=columns)
+
+RAW_PAGE_SIZES = [50, 100, 250, 500]
+
+@st.fragment
+def renderRawLineItems(filters):
+    """A paged explorer of the line items matching the dashboard filters.
+
+    Only the visible page of the selected columns is queried and sent to the browser; the
+    explorer widgets rerun only this section.
+    """
+    if not st.toggle("Show raw line items"):
+        return
+    start_date, end_date = filters["date_range"]
+    all_columns = list(LINE_ITEM_SELECT)
+
+    columns = st.multiselect("Columns", options=all_columns, default=all_columns, key="raw_columns")
+    sort_column, sort_order, search_column, search_input = st.columns([2, 1, 2, 2])
+    with sort_column:
+        sort_by = st.selectbox("Sort by", options=all_columns, index=all_columns.index("orderline_id"), key="raw_sort_by")
+    with sort_order:
+        descending = st.selectbox("Order", options=["Ascending", "Descending"], key="raw_sort_order") == "Descending"
+    with search_column:
+        search_by = st.selectbox("Search in", options=all_columns, index=all_columns.index("order_code"), key="raw_search_by")
+    with search_input:
+        search_text = st.text_input("Contains", key="raw_search_text").strip()
+
+    if not columns:
+        st.info("Select at least one column.")
+        return
+
+    total_rows = getRawLineItemCount(start_date, end_date, filters["categories"], search_by, search_text)
+    size_column, page_column, count_column = st.columns([1, 1, 3])
+    with size_column:
+        page_size = st.selectbox("Rows per page", options=RAW_PAGE_SIZES, index=1, key="raw_page_size")
+    page_count = max(1, -(-total_rows // page_size))
+    # A narrower search or a larger page can leave the current page past the end
+    if st.session_state.get("raw_page", 1) > page_count:
+        st.session_state.raw_page = page_count
+    with page_column:
+        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="raw_page")
+
+    raw_data = getRawLineItemPage(
+        start_date, end_date, filters["categories"], tuple(columns), sort_by, descending, search_by, search_text, page, page_size
+    )
+    first_row = (page - 1) * page_size + 1 if raw_data.num_rows else 0
+    last_row = first_row + raw_data.num_rows - 1 if raw_data.num_rows else 0
+    with count_column:
+        st.caption(f"Rows {first_row:,}–{last_row:,} of {total_rows:,} line items, page {page} of {page_count}")
+    st.dataframe(data=raw_data, height=600, use_container_width=True, hide_index=True)
+
+renderRawLineItems(dashboard_filters)
+
+# Rows per warehouse page of an export; only one page is held in memory at a time
+EXPORT_BATCH_SIZE = int(getSetting("DASHBOARD_EXPORT_BATCH_SIZE", 50000))
+
+# Prepared exports are written to this directory and deleted once they are older than
+# DASHBOARD_EXPORT_MAX_AGE seconds, whether or not they were downloaded
+EXPORT_DIRECTORY = getSetting("DASHBOARD_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "line_item_exports"))
+EXPORT_MAX_AGE = float(getSetting("DASHBOARD_EXPORT_MAX_AGE", 3600))
+
+# A download button holds the whole file in memory, so larger exports are not offered in-app
+EXPORT_MAX_DOWNLOAD_BYTES = int(getSetting("DASHBOARD_EXPORT_MAX_DOWNLOAD_BYTES", 200_000_000))
+
+def exportLineItems(filters, columns, file_format, on_page=None):
+    """Writes the `columns` of the line items matching `filters` to a temporary `file_format` file.
+
+    The rows are fetched from the warehouse in keyset-paginated pages that are written out as
+    they arrive. Returns the file's path in `EXPORT_DIRECTORY` and the number of rows; the
+    file is removed if the export fails.
+    """
+    start_date, end_date = filters["date_range"]
+    extension, _ = line_item_export.FORMATS[file_format]
+    pages = line_item_loader.iter_pages(
+        getQueryExecutor(), start_date, end_date, filters["categories"],
+        columns={*columns, "orderline_id"}, batch_size=EXPORT_BATCH_SIZE, label="export_page",
+    )
+    os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(prefix=line_item_export.FILE_PREFIX, suffix=f".{extension}", dir=EXPORT_DIRECTORY)
+    try:
+        try:
+            sink = os.fdopen(descriptor, "wb")
+        except BaseException:
+            os.close(descriptor)
+            raise
+        with sink, tracing.span("export", format=file_format, columns=len(columns)) as attributes:
+            attributes["rows"] = line_item_export.write_export(pages, sink, file_format, columns, on_page=on_page)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, attributes["rows"]
+
+@st.fragment
+def renderLineItemExport(filters):
+    """Exports the line items matching the dashboard filters to CSV, Parquet or Excel.
+
+    The download button is only shown on the run that prepared the export, and the file is
+    deleted as soon as the button has read it, so a prepared export is not held in memory
+    again on every rerun.
+    """
+    # Exports too large to offer in-app, and those of interrupted runs, are swept by age
+    if os.path.isdir(EXPORT_DIRECTORY):
+        line_item_export.remove_stale_exports(EXPORT_DIRECTORY, EXPORT_MAX_AGE)
+    with st.expander("Export line items"):
+        all_columns = list(LINE_ITEM_SELECT)
+        columns = st.multiselect("Columns", options=all_columns, default=all_columns, key="export_columns")
+        file_format = st.radio("Format", options=list(line_item_export.FORMATS), horizontal=True, key="export_format")
+
+        if not st.button("Prepare export", disabled=not columns, key="export_prepare"):
+            return
+        progress = st.empty()
+        try:
+            path, rows = exportLineItems(
+                filters, columns, file_format,
+                on_page=lambda rows_written: progress.caption(f"Exporting line items… {rows_written:,} rows written"),
+            )
+        except line_item_loader.PartialLoadError as e:
+            st.error(f"Databricks connection error: {e.__cause__ or e}")
+            return
+        finally:
+            progress.empty()
+
+        size = os.path.getsize(path)
+        if size > EXPORT_MAX_DOWNLOAD_BYTES:
+            st.warning(
+                f"The export has {rows:,} rows ({size:,} bytes), more than can be downloaded here. "
+                f"It was written to `{path}` on the server and is kept for {EXPORT_MAX_AGE / 60:.0f} minutes."
+            )
+            return
+        extension, mime = line_item_export.FORMATS[file_format]
+        start_date, end_date = filters["date_range"]
+        try:
+            with open(path, "rb") as exported:
+                st.download_button(
+                    f"Download {rows:,} rows as {file_format}",
+                    data=exported,
+                    file_name=f"line_items_{start_date}_{end_date}.{extension}",
+                    mime=mime,
+                    on_click="ignore",
+                    key="export_download",
+                )
+        finally:
+            os.unlink(path)
+
+renderLineItemExport(dashboard_filters)
+
+def renderDataFreshness(placeholder, filters):
+    """Shows when the line items behind the charts were loaded, and whether they are stale or failed to refresh."""
+    if AGGREGATION_MODE == "warehouse":
+        return
+    refreshed = getLineItemRefresher().status(lineItemKey(**filters))
+    if refreshed is None:
+        return
+    as_of = datetime.fromtimestamp(refreshed.as_of).strftime("%Y-%m-%d %H:%M:%S")
+    age = time.time() - refreshed.as_of
+    if refreshed.error is not None:
+        failed_at = datetime.fromtimestamp(refreshed.failed_at).strftime("%H:%M:%S")
+        badge = f":red[● Refresh failed at {failed_at}: {refreshed.error}]"
+    elif age > 2 * REFRESH_INTERVAL:
+        badge = ":orange[● Stale]"
+    else:
+        badge = ":green[● Up to date]"
+    placeholder.caption(f"{badge} · Data as of {as_of} ({age:.0f} s ago)")
+
+renderDataFreshness(data_freshness, dashboard_filters)
+
+# Waterfall of this run's spans, shown with ?debug=1 in the URL or the DASHBOARD_DEBUG setting
+if getFlag("DASHBOARD_DEBUG", "false") or st.query_params.get("debug") in ("1", "true"):
+    with st.expander("Debug: where this run spent its time"):
+        span_rows = tracing.span_rows(trace)
+        st_echarts(options=tracing.waterfall_options(trace), height=f"{max(300, 22 * len(span_rows) + 80)}px")
+        st.dataframe(pd.DataFrame(span_rows), use_container_width=True)
+
+        # Query records are kept per process, so they cover every session
+        query_log = getQueryLog()
+        st.markdown("Queries by label, all sessions")
+        st.dataframe(pd.DataFrame.from_dict(query_log.summary(), orient="index"), use_container_width=True)
+        st.markdown("Latest queries")
+        st.dataframe(pd.DataFrame(query_log.entries(limit=100)), use_container_width=True)
+        st.markdown("Latest line-item loads, their size in memory and rows per order line")
+        st.dataframe(pd.DataFrame(query_log.loads(limit=20)), use_container_width=True)
+        partial_loads = query_log.partial_loads()
+        if partial_loads:
+            st.markdown("Line-item loads that failed part way")
+            st.dataframe(pd.DataFrame(partial_loads), use_container_width=True)
+        st.markdown("Connection pool, all sessions")
+        st.dataframe(pd.DataFrame([getConnectionPool().stats()]), use_container_width=True, hide_index=True)
+        st.markdown("Payload caches, all sessions")
+        st.dataframe(
+            pd.DataFrame.from_dict({kind: getPayloadCache(kind).stats() for kind in ("aggregates", "options")}, orient="index"),
+            use_container_width=True,
+        )
+        if getSharedCache() is not None:
+            st.markdown("Shared line-item cache, this replica")
+            st.dataframe(pd.DataFrame([getSharedCache().stats()]), use_container_width=True, hide_index=True)
@@ -0,0 +1,50 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def filter_categories(table, categories, column="main_product_category"):
+    """Keeps the rows whose `column` is one of `categories`."""
+    value_type = table.schema.field(column).type
+    if pa.types.is_dictionary(value_type):
+        value_type = value_type.value_type
+    return table.filter(pc.is_in(table[column], value_set=pa.array(list(categories), type=value_type)))
+
+
+def filter_date_range(table, column, start, end):
+    """Keeps the rows whose `column` falls within [start, end], dropping missing dates.
+
+    Dates and timezone-aware timestamps are compared as naive microsecond timestamps, the
+    same way the pandas `to_datetime` comparison treated them.
+    """
+    values = table[column]
+    if not pa.types.is_timestamp(values.type) or values.type.tz is not None or values.type.unit != "us":
+        values = pc.cast(values, pa.timestamp("us"))
+    start = pa.scalar(pd.Timestamp(start).to_pydatetime(), type=pa.timestamp("us"))
+    end = pa.scalar(pd.Timestamp(end).to_pydatetime(), type=pa.timestamp("us"))
+    return table.filter(pc.and_(pc.greater_equal(values, start), pc.less_equal(values, end)))
+
+
+def distinct_values(table, column):
+    """Distinct non-null values of `column` in order of first appearance."""
+    return pc.unique(pc.drop_null(table[column])).to_pylist()
+
+
+def count_distinct(table, column):
+    """Number of distinct non-null values of `column`."""
+    return pc.count_distinct(table[column]).as_py()
+
+
+def to_pandas(table, columns=None):
+    """Converts only `columns` (when given and present) of `table` to a pandas DataFrame.
+
+    Dictionary columns become categoricals with sorted categories, so groupbys order their
+    groups the same way they did for plain strings.
+    """
+    if columns is not None:
+        table = table.select([column for column in columns if column in table.column_names])
+    frame = table.to_pandas()
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].cat.reorder_categories(sorted(frame[column].cat.categories))
+    return frame
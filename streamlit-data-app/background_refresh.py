@@ -0,0 +1,164 @@
+import logging
+import reprlib
+import threading
+import time
+import weakref
+from dataclasses import dataclass, replace
+
+import tracing
+from key_locks import KeyLocks
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Refreshed:
+    value: object
+    as_of: float
+    # Changes only when a reload returned different data, see `BackgroundRefresher`
+    version: object = None
+    # Time and message of the last failed refresh, cleared by the next successful one
+    failed_at: float = None
+    error: str = None
+
+    def next_refresh(self, interval):
+        """When the value is due for a reload; a failed reload waits a full interval before the next try."""
+        return max(self.as_of, self.failed_at or 0) + interval
+
+
+class BackgroundRefresher:
+    """Serves the last good value per key and reloads the keys in use on a daemon thread.
+
+    The first `get` of a key loads it on the calling thread; from then on `get` returns the
+    stored value at once, however old, and the thread calls `load(key)` again once the value
+    is `interval` seconds old. A failed reload keeps the previous value, records the error and
+    is retried an interval later. Keys not read for `idle_timeout` seconds stop being refreshed
+    and are dropped, and at most `max_keys` are kept, the least recently read going first. Each
+    reload is traced as a `name` trace.
+
+    Every value carries the version `version(value)`, a cheap summary that stays the same
+    while reloads return the same data, so results derived from a value can be keyed on it.
+    Without `version`, every load is a new version.
+
+    The thread holds the refresher only weakly: once nothing else references it, e.g. after
+    `st.cache_resource.clear()`, the refresher is collected and its thread ends, as after `stop`.
+    """
+
+    def __init__(self, load, interval=30, max_keys=8, idle_timeout=600, name="background_refresh", version=None):
+        self.load = load
+        self.version = version
+        self.interval = interval
+        self.max_keys = max_keys
+        self.idle_timeout = idle_timeout
+        self.name = name
+        self._entries = {}
+        self._last_read = {}
+        self._lock = threading.Lock()
+        self._key_locks = KeyLocks()
+        self._wake = threading.Event()
+        self._thread = None
+        weakref.finalize(self, self._wake.set)
+
+    def get(self, key, load=None):
+        """Returns the `Refreshed` value of `key`, loading it with `load` (or the refresher's own
+        loader) only if it has never been loaded. A failed first load raises."""
+        entry = self._read(key)
+        if entry is not None:
+            return entry
+        with self._key_locks(key):
+            entry = self._read(key)
+            if entry is None:
+                value = (load or self.load)(key)
+                entry = self._refreshed(value)
+                self._store(key, entry)
+        self._start()
+        return entry
+
+    def status(self, key):
+        """Returns the `Refreshed` value of `key` without loading it, or None if there is none."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def refresh(self, key):
+        """Reloads `key` now, keeping the previous value if the load fails."""
+        with self._key_locks(key):
+            tracing.start_trace(self.name, key=repr(key))
+            try:
+                value = self.load(key)
+            except Exception as e:
+                logger.warning("Refresh of %s failed, keeping the previous value: %s", reprlib.repr(key), e)
+                with self._lock:
+                    previous = self._entries.get(key)
+                    if previous is not None:
+                        self._entries[key] = replace(previous, failed_at=time.time(), error=str(e))
+            else:
+                # A key dropped while it was reloading stays dropped
+                if self.status(key) is not None:
+                    self._store(key, self._refreshed(value))
+
+    def stop(self):
+        """Stops the refresh thread after its current reload."""
+        thread, self._thread = self._thread, None
+        self._wake.set()
+        if thread is not None:
+            thread.join()
+
+    def _refreshed(self, value):
+        as_of = time.time()
+        return Refreshed(value, as_of, version=self.version(value) if self.version is not None else as_of)
+
+    def _read(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._last_read[key] = time.time()
+            return entry
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._last_read.setdefault(key, time.time())
+            for stale_key in sorted(self._last_read, key=self._last_read.get)[:-self.max_keys]:
+                self._drop(stale_key)
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        self._last_read.pop(key, None)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._wake.clear()
+            self._thread = threading.Thread(target=_run, args=(weakref.ref(self), self._wake), name=self.name, daemon=True)
+            self._thread.start()
+
+    def _due(self):
+        """Drops the idle keys and returns the keys due for a reload, the most overdue first."""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, read in self._last_read.items() if now - read > self.idle_timeout]:
+                self._drop(key)
+            due = sorted(self._entries.items(), key=lambda item: item[1].next_refresh(self.interval))
+        return [key for key, entry in due if entry.next_refresh(self.interval) <= now]
+
+
+
+def _run(reference, wake):
+    """The refresh loop of the refresher `reference` points to, which it only holds while working."""
+    while True:
+        refresher = reference()
+        if refresher is None or refresher._thread is not threading.current_thread():
+            return
+        for key in refresher._due():
+            if refresher._thread is not threading.current_thread():
+                return
+            refresher.refresh(key)
+        with refresher._lock:
+            next_refresh = min(
+                (entry.next_refresh(refresher.interval) for entry in refresher._entries.values()),
+                default=time.time() + refresher.interval,
+            )
+        del refresher
+        wake.wait(max(1.0, next_refresh - time.time()))
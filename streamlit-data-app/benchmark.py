@@ -0,0 +1,534 @@
+"""Offline benchmark of the dashboard's hot paths on synthetic line items.
+
+Generates a table with every column of the line-item query (`queries.LINE_ITEM_SELECT`) and
+serves it through a stand-in for the query executor, so no warehouse access is needed. Each
+stage is timed on its own: the keyset-paginated load, type coercion, the filter / distinct
+count block, the pandas conversion and metrics, and, by running app.py under Streamlit's
+AppTest, every chart section's option building and serialization. Results are written as
+JSON so runs can be compared over time:
+
+    python benchmark.py --rows 1M --output bench-1m.json
+    python benchmark.py --rows 1M --compare bench-1m.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import aggregates
+import arrow_filters
+import line_item_loader
+import line_item_schema
+import metrics
+import projection
+from incremental_refresh import WATERMARK_COLUMNS
+from queries import LINE_ITEM_SELECT, split_date_range
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ORDER_STATUSES = ["COMPLETE", "PENDING", "SCHEDULED"]
+LINE_ITEM_TYPES = ["Service", "Rental", "Delivery", "Fuel"]
+STATES = ["CO", "TX", "CA", "AZ", "UT", "NM", "FL", "GA"]
+MONEY = pa.decimal128(12, 2)
+
+
+def parse_rows(value):
+    """Parses a row count such as 100000, 100k or 1M."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", value.strip())
+    if match is None:
+        raise argparse.ArgumentTypeError(f"Invalid row count: {value!r}")
+    return int(float(match.group(1)) * {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()])
+
+
+def _ids(prefix, count):
+    """`count` distinct ids that sort in numeric order, e.g. oli-0000000042."""
+    numbers = pc.utf8_lpad(pc.cast(pa.array(np.arange(count)), pa.string()), width=10, padding="0")
+    return pc.binary_join_element_wise(prefix, numbers, "")
+
+
+def _labels(prefix, count):
+    return pa.array([f"{prefix} {i:02d}" for i in range(count)])
+
+
+def _with_nulls(values, rng, share):
+    return pc.if_else(pa.array(rng.random(len(values)) < share), pa.nulls(len(values), values.type), values)
+
+
+def generate_line_items(rows, categories=12, months=24, end_date=None, seed=0):
+    """Generates `rows` synthetic line items shaped like the result of the line-item query.
+
+    Columns, names and Arrow types match what the warehouse returns for `LINE_ITEM_SELECT`
+    (decimals for amounts, dates, UTC timestamps, plain strings), ordered by `orderline_id`.
+    Orders carry about three lines each and end within the `months` months up to `end_date`
+    (today by default); `categories` main product categories are spread over a third as many
+    category groups. The same arguments always generate the same table.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end_date or date.today()).normalize()
+    start = end - pd.DateOffset(months=months) + pd.Timedelta(days=1)
+    days = (end - start).days + 1
+
+    order_count = max(1, rows // 3)
+    order_group_count = max(1, order_count // 2)
+    user_group_count = max(1, min(2000, order_count // 20))
+    user_count = user_group_count * 3
+    product_count = categories * 5
+    seller_location_count = max(1, min(500, order_group_count // 10))
+
+    def take(values, index):
+        return values.take(pa.array(index))
+
+    # User groups and their users
+    user_group_ids = _ids("ug-", user_group_count)
+    owner_index = rng.integers(0, 25, user_group_count)
+    owner_ids = _with_nulls(take(_ids("u-", user_count), owner_index), rng, 0.1)
+    user_group_industry = _with_nulls(take(_labels("Industry", 8), rng.integers(0, 8, user_group_count)), rng, 0.1)
+    user_group_of_user = rng.integers(0, user_group_count, user_count)
+
+    # Order groups: product, seller location and delivery address
+    order_group_product = rng.integers(0, product_count, order_group_count)
+    order_group_location = rng.integers(0, seller_location_count, order_group_count)
+    order_group_start = rng.integers(0, days, order_group_count)
+
+    # Orders
+    order_group = rng.integers(0, order_group_count, order_count)
+    order_user = rng.integers(0, user_count, order_count)
+    order_end_day = rng.integers(0, days, order_count)
+    order_status = rng.choice(len(ORDER_STATUSES), order_count, p=[0.7, 0.2, 0.1])
+    created_on = (start + pd.to_timedelta(order_end_day, unit="D") - pd.to_timedelta(rng.integers(1, 24 * 30, order_count), unit="h")).tz_localize("UTC")
+
+    # Line items, in `orderline_id` order
+    line_order = rng.integers(0, order_count, rows)
+    line_group = order_group[line_order]
+    line_user = order_user[line_order]
+    line_user_group = user_group_of_user[line_user]
+    line_product = order_group_product[line_group]
+    line_category = line_product % categories
+    line_owner = owner_index[line_user_group]
+    quantity = rng.integers(1, 5, rows).astype("float64")
+    rate = np.round(rng.uniform(10, 500, rows), 2)
+
+    def timestamps(values):
+        return pa.array(values[line_order], type=pa.timestamp("us", tz="UTC"))
+
+    def dates(day_offsets):
+        return pa.array((start + pd.to_timedelta(day_offsets, unit="D")).date, type=pa.date32())
+
+    columns = {
+        "user_group_id": take(user_group_ids, line_user_group),
+        "ordergroup_id": take(_ids("og-", order_group_count), line_group),
+        "project_id": pa.nulls(rows, pa.string()),
+        "order_group_agreement": pa.nulls(rows, pa.string()),
+        "order_group_code": take(_ids("OG", order_group_count), line_group),
+        "order_group_end_date": dates(np.minimum(order_group_start[line_group] + 30, days - 1)),
+        "order_group_is_delivery": pa.array(rng.random(order_group_count)[line_group] < 0.5),
+        "order_group_placement_details": take(pa.array(["Place on the driveway", "Call on arrival", None]), rng.integers(0, 3, order_group_count)[line_group]),
+        "order_group_removal_fee": pc.cast(pa.array(np.full(rows, 25.0)), MONEY),
+        "order_group_shift_count": pa.array(rng.integers(0, 3, rows), type=pa.int32()),
+        "order_group_start_date": dates(order_group_start[line_group]),
+        "order_id": take(_ids("o-", order_count), line_order),
+        "order_accepted_on": timestamps(created_on + pd.Timedelta(hours=1)),
+        "order_billing_comments_internal_use": pa.nulls(rows, pa.string()),
+        "order_code": take(_ids("O", order_count), line_order),
+        "order_completed_on": pc.if_else(pa.array(order_status[line_order] == 0), timestamps(created_on + pd.Timedelta(days=2)), pa.nulls(rows, pa.timestamp("us", tz="UTC"))),
+        "order_created_on": timestamps(created_on),
+        "order_end_date": dates(order_end_day[line_order]),
+        "order_schedule_window": take(pa.array(["Morning (7am-11am)", "Afternoon (12pm-4pm)", "Anytime"]), rng.integers(0, 3, rows)),
+        "order_status": take(pa.array(ORDER_STATUSES), order_status[line_order]),
+        "order_submitted_on": timestamps(created_on + pd.Timedelta(minutes=5)),
+        "order_created_by": take(_ids("u-", user_count), line_user),
+        "submitted_by_id": take(_ids("u-", user_count), line_user),
+        "orderline_id": _ids("oli-", rows),
+        "orderline_backbill": pa.array(np.zeros(rows, dtype=bool)),
+        "orderline_is_flat_rate": pa.array(rng.random(rows) < 0.1),
+        "orderline_paid": pa.array(rng.random(rows) < 0.8),
+        "orderline_quantity": pc.cast(pa.array(quantity), MONEY),
+        "orderline_rate": pc.cast(pa.array(rate), MONEY),
+        "order_line_total": pc.cast(pa.array(np.round(rate * quantity, 2)), pa.decimal128(24, 4)),
+        "orderline_platform_fee_percent": pc.cast(pa.array(np.round(rng.uniform(5, 30, rows), 2)), MONEY),
+        "orderline_tax": pc.cast(pa.array(np.zeros(rows)), MONEY),
+        "stripe_invoice_line_item_id": _ids("ii_", rows),
+        "orderline_type": take(pa.array([str(i) for i in range(len(LINE_ITEM_TYPES))]), rng.integers(0, len(LINE_ITEM_TYPES), rows)),
+        "main_product": take(_labels("Product", product_count), line_product),
+        "main_product_category": take(_labels("Category", categories), line_category),
+        "main_product_category_group": take(_labels("Group", max(1, categories // 3)), line_category % max(1, categories // 3)),
+        "user_address_state": take(pa.array(STATES), rng.integers(0, len(STATES), order_group_count)[line_group]),
+        "user_is_staff": pa.array(rng.random(user_count)[line_user] < 0.2),
+        "user_first_name": take(_labels("First", user_count), line_user),
+        "user_last_name": take(_labels("Last", user_count), line_user),
+        "industry_name": take(user_group_industry, line_user_group),
+        "user_group_name": take(_labels("Customer", user_group_count), line_user_group),
+        "user_group_account_owner_id": take(owner_ids, line_user_group),
+        "account_owner_first_name": take(_labels("Owner", 25), line_owner),
+        "account_owner_last_name": take(_labels("Rep", 25), line_owner),
+        "seller_name": take(_labels("Seller", (seller_location_count + 2) // 3), order_group_location[line_group] // 3),
+        "seller_location_name": take(_labels("Location", seller_location_count), order_group_location[line_group]),
+        "orderline_item_type_name": take(pa.array(LINE_ITEM_TYPES), rng.integers(0, len(LINE_ITEM_TYPES), rows)),
+    }
+    # The owner names are null where the user group has no account owner
+    has_owner = pc.is_valid(columns["user_group_account_owner_id"])
+    for name in ("account_owner_first_name", "account_owner_last_name"):
+        columns[name] = pc.if_else(has_owner, columns[name], pa.nulls(rows, pa.string()))
+    assert list(columns) == list(LINE_ITEM_SELECT), "the generator must follow queries.LINE_ITEM_SELECT"
+    return pa.table(columns)
+
+
+class SyntheticExecutor:
+    """Stand-in for `query_executor.QueryExecutor` that serves a generated line-item table.
+
+    It answers the keyset-paginated line-item queries of `line_item_loader.load_shard`
+    (applying the date, category and `changed_since` filters and the selected columns) and
+    `queries.DATA_VERSION_QUERY`; any other query raises. `latency` seconds are slept per
+    query to stand in for the warehouse round trip.
+    """
+
+    def __init__(self, table, max_workers=4, latency=0.0):
+        self.table = table
+        self.latency = latency
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="synthetic-query")
+        self._lock = threading.Lock()
+        self._filtered = {}  # filter parameters -> matching rows
+        self._offsets = {}  # (filter parameters, last id) -> offset of the next page
+        self._stats = {"queries": 0, "rows": 0}
+
+    def execute(self, query, parameters=None, timeout=None, label=None):
+        """Returns the result of `query` as a PyArrow Table."""
+        if self.latency:
+            time.sleep(self.latency)
+        if "AS watermark" in query:
+            result = self._data_version()
+        else:
+            result = self._page(query, dict(parameters or {}))
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["rows"] += result.num_rows
+        return result
+
+    def submit(self, query, parameters=None, timeout=None, label=None):
+        return self._workers.submit(self.execute, query, parameters, timeout, label)
+
+    def submit_task(self, task, *args, **kwargs):
+        return self._workers.submit(task, *args, **kwargs)
+
+    def shutdown(self):
+        self._workers.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _data_version(self):
+        watermark = pc.max(pc.max_element_wise(*[self.table[column] for column in WATERMARK_COLUMNS])).as_py()
+        return pa.table({"watermark": [watermark], "order_count": [arrow_filters.count_distinct(self.table, "order_id")]})
+
+    def _page(self, query, parameters):
+        limit = re.search(r"LIMIT (\d+)", query)
+        if limit is None or "ORDER BY oli.id" not in query:
+            raise ValueError("The synthetic executor only serves line-item pages and the data version")
+        columns = re.findall(r"\bAS (\w+)", query)
+        last_id = parameters.pop("last_id", None)
+        key = tuple(sorted(parameters.items()))
+        rows = self._filter(key, parameters)
+        with self._lock:
+            offset = 0 if last_id is None else self._offsets.get((key, last_id))
+        if offset is None:
+            offset = pc.sum(pc.less_equal(rows["orderline_id"], last_id)).as_py() or 0
+        # Take a copy: like a real result, a page must not share the buffers of the whole table,
+        # which pickling (st.cache_data) would otherwise write out once per page
+        page = rows.select(columns).take(pa.array(np.arange(offset, min(offset + int(limit.group(1)), rows.num_rows))))
+        if page.num_rows:
+            with self._lock:
+                self._offsets[(key, page["orderline_id"][-1].as_py())] = offset + page.num_rows
+        return page
+
+    def _filter(self, key, parameters):
+        with self._lock:
+            if key in self._filtered:
+                return self._filtered[key]
+        table = self.table
+        masks = []
+        if "changed_since" in parameters:
+            watermark = pc.max_element_wise(*[table[column] for column in WATERMARK_COLUMNS])
+            masks.append(pc.greater(watermark, pa.scalar(parameters["changed_since"], type=pa.timestamp("us", tz="UTC"))))
+        if "start_date" in parameters:
+            masks.append(pc.greater_equal(table["order_end_date"], pa.scalar(parameters["start_date"], type=pa.date32())))
+        if "end_date" in parameters:
+            masks.append(pc.less_equal(table["order_end_date"], pa.scalar(parameters["end_date"], type=pa.date32())))
+        categories = [value for name, value in parameters.items() if name.startswith("category_")]
+        if categories:
+            masks.append(pc.is_in(table["main_product_category"], value_set=pa.array(categories)))
+        if masks:
+            mask = masks[0]
+            for other in masks[1:]:
+                mask = pc.and_(mask, other)
+            table = table.filter(mask)
+        with self._lock:
+            self._filtered[key] = table
+        return table
+
+
+@contextmanager
+def timed(timings, name):
+    """Appends the wall time of the `with` block to `timings[name]`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+
+
+def run_pipeline(executor, columns, start_date, end_date, categories, shards, batch_size, timings):
+    """Runs the app-side line-item path once, stage by stage, recording each stage in `timings`."""
+    with timed(timings, "load"):
+        futures = [
+            executor.submit_task(line_item_loader.load_shard, executor, shard_start, shard_end, None, None, columns, batch_size)
+            for shard_start, shard_end in split_date_range(start_date, end_date, shards)
+        ]
+        batches = [batch for future in futures for batch in future.result()]
+        data = pa.concat_tables(batches)
+        if len(futures) > 1:
+            data = data.sort_by("orderline_id")
+    with timed(timings, "compact"):
+        data = line_item_schema.compact(data)
+    with timed(timings, "filter"):
+        category_data = arrow_filters.filter_categories(data, categories)
+        arrow_filters.count_distinct(category_data, "order_id")
+        date_data = arrow_filters.filter_date_range(category_data, "order_end_date", start_date, end_date)
+    with timed(timings, "to_pandas"):
+        frame = arrow_filters.to_pandas(date_data, aggregates.LINE_ITEM_COLUMNS)
+    with timed(timings, "prepare"):
+        frame = metrics.prepare_line_items(frame)
+    with timed(timings, "aggregate"):
+        line_item_aggregates = aggregates.line_item_aggregates(frame)
+    with timed(timings, "summarize"):
+        aggregates.summarize(line_item_aggregates)
+    return data.num_rows
+
+
+def run_app(executor, batch_size, shards, timings, charts):
+    """Runs app.py under AppTest on `executor`, once with cold caches and once warm.
+
+    Full fetch mode and app-side aggregation are used, so the only queries are line-item
+    pages and the data version. Chart sections are timed through the options memo: the time
+    to build each section's options (excluding the shared aggregates, timed as `aggregates`)
+    and to serialize them to JSON the way the ECharts component does.
+    """
+    import streamlit as st
+    import streamlit_echarts
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+
+    import payload_cache
+    import query_executor
+
+    local = threading.local()
+    get_or_compute = payload_cache.PayloadCache.get_or_compute
+
+    def timed_get_or_compute(cache, key, compute):
+        label = key[1] if isinstance(key[1], str) else "aggregates"
+
+        def timed_compute():
+            stack = local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return compute()
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                timings.setdefault(label, []).append(elapsed - nested)
+
+        value = get_or_compute(cache, key, timed_compute)
+        if label != "aggregates":
+            local.section = label
+        return value
+
+    def serialize(options, **kwargs):
+        section = getattr(local, "section", "unknown")
+        start = time.perf_counter()
+        payload = json.dumps(options)
+        serialize_s = time.perf_counter() - start
+        chart = charts.setdefault(section, {"serialize_s": 0.0, "payload_bytes": 0, "charts": 0})
+        chart["serialize_s"] += serialize_s
+        chart["payload_bytes"] += len(payload)
+        chart["charts"] += 1
+
+    # AppTest runs without a server, which Streamlit warns about on every cached call
+    set_log_level("error")
+    app = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=3600)
+    for name in ("DATABRICKS_SERVER_HOSTNAME", "DATABRICKS_HTTP_PATH", "DATABRICKS_ACCESS_TOKEN", "DATABRICKS_WAREHOUSE_ID"):
+        app.secrets[name] = "benchmark"
+    app.secrets["DASHBOARD_FETCH_MODE"] = "full"
+    app.secrets["DASHBOARD_AGGREGATION_MODE"] = "app"
+    app.secrets["DASHBOARD_REFRESH_MODE"] = "full"
+    app.secrets["DASHBOARD_BATCH_SIZE"] = batch_size
+    app.secrets["DASHBOARD_LOAD_SHARDS"] = shards
+    # Timed runs must not overlap with background reloads
+    app.secrets["DASHBOARD_REFRESH_INTERVAL"] = 10 ** 9
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    with mock.patch.object(query_executor.QueryExecutor, "execute", lambda _, query, parameters=None, timeout=None, label=None: executor.execute(query, parameters)), \
+            mock.patch.object(payload_cache.PayloadCache, "get_or_compute", timed_get_or_compute), \
+            mock.patch.object(streamlit_echarts, "st_echarts", serialize):
+        with timed(timings, "script_run"):
+            app.run()
+        if app.exception:
+            raise RuntimeError(f"app.py raised: {app.exception[0].value}")
+        with timed(timings, "warm_rerun"):
+            app.run()
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def summarize_runs(runs):
+    return {"median_s": round(statistics.median(runs), 4), "min_s": round(min(runs), 4), "runs": [round(run, 4) for run in runs]}
+
+
+def benchmark(args):
+    """Runs the benchmark described by the parsed command line and returns the JSON report."""
+    start = time.perf_counter()
+    table = generate_line_items(args.rows, categories=args.categories, months=args.months, end_date=args.end_date, seed=args.seed)
+    generate_s = time.perf_counter() - start
+    start_date = pc.min(table["order_end_date"]).as_py()
+    end_date = pc.max(table["order_end_date"]).as_py()
+    categories = arrow_filters.distinct_values(table, "main_product_category")
+    selected = sorted(categories)[:-1] or categories  # everything but one category, as after deselecting one
+
+    projection.register_widget("line_item_cube", aggregates.LINE_ITEM_COLUMNS)
+    columns = None if args.columns == "all" else projection.required_columns(["line_item_cube"])
+
+    executor = SyntheticExecutor(table, max_workers=args.shards, latency=args.query_latency)
+    timings = {}
+    try:
+        for _ in range(args.repeat):
+            loaded_rows = run_pipeline(executor, columns, start_date, end_date, selected, args.shards, args.batch_size, timings)
+        stages = {name: summarize_runs(runs) for name, runs in timings.items()}
+
+        app = None
+        if not args.skip_app:
+            app_timings, charts = {}, {}
+            for _ in range(args.repeat):
+                run_app(executor, args.batch_size, args.shards, app_timings, charts)
+            app = {name: summarize_runs(runs) for name, runs in app_timings.items() if name in ("script_run", "warm_rerun", "aggregates")}
+            app["charts"] = {
+                section: {
+                    "prepare": summarize_runs(app_timings[section]),
+                    # Every run serializes the options twice, on the cold run and on the rerun
+                    "serialize_s": round(chart["serialize_s"] / (2 * args.repeat), 4),
+                    "payload_bytes": chart["payload_bytes"] // (2 * args.repeat),
+                    "charts": chart["charts"] // (2 * args.repeat),
+                }
+                for section, chart in charts.items() if section in app_timings
+            }
+    finally:
+        executor.shutdown()
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "pyarrow": pa.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "rows": args.rows,
+            "columns": len(columns or LINE_ITEM_SELECT),
+            "categories": args.categories,
+            "months": args.months,
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "batch_size": args.batch_size,
+            "shards": args.shards,
+            "query_latency_s": args.query_latency,
+        },
+        "generate_s": round(generate_s, 4),
+        "table_bytes": table.nbytes,
+        "loaded_rows": loaded_rows,
+        "queries": executor.stats(),
+        "stages": stages,
+        "app": app,
+    }
+
+
+def _medians(report):
+    medians = {f"stage {name}": stage["median_s"] for name, stage in report["stages"].items()}
+    if report.get("app"):
+        for name, stage in report["app"].items():
+            if name != "charts":
+                medians[f"app {name}"] = stage["median_s"]
+        for section, chart in report["app"]["charts"].items():
+            medians[f"chart {section}"] = chart["prepare"]["median_s"]
+            medians[f"serialize {section}"] = chart["serialize_s"]
+    return medians
+
+
+def print_report(report, baseline=None):
+    config = report["config"]
+    print(f"{config['rows']:,} rows x {config['columns']} columns, {config['categories']} categories, "
+          f"{config['months']} months; median of {config['repeat']} runs")
+    before = _medians(baseline) if baseline else {}
+    for name, seconds in _medians(report).items():
+        line = f"  {name:<32} {seconds:9.4f}s"
+        if before.get(name):
+            line += f"  {seconds / before[name]:6.2f}x baseline"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=parse_rows, default=parse_rows("100k"), help="line items to generate, e.g. 100k, 1M or 10M")
+    parser.add_argument("--categories", type=int, default=12, help="number of main product categories")
+    parser.add_argument("--months", type=int, default=24, help="months of order end dates")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None, help="last order end date (default today)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the median is reported")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per line-item page")
+    parser.add_argument("--shards", type=int, default=4, help="date-range shards loaded concurrently")
+    parser.add_argument("--query-latency", type=float, default=0.0, help="seconds slept per query")
+    parser.add_argument("--columns", choices=("widgets", "all"), default="widgets",
+                        help="load the columns the widgets read, or every line-item column")
+    parser.add_argument("--skip-app", action="store_true", help="skip the AppTest run of app.py")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="print the JSON report instead of the summary")
+    args = parser.parse_args(argv)
+
+    report = benchmark(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        baseline = None
+        if args.compare:
+            with open(args.compare, "r") as f:
+                baseline = json.load(f)
+        print_report(report, baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
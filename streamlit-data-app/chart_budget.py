@@ -0,0 +1,81 @@
+import json
+
+import pandas as pd
+
+
+# Label of the bucket that the labels cut by `top_n` are merged into
+OTHER = "Other"
+
+# Periods that `coarsen_periods` merges months into, finest first
+COARSER_PERIODS = ["Q", "Y"]
+
+# Chart -> the most points it sends to the browser: kept labels for the categorical charts
+# (per parent for the nested ones), points per series for the monthly ones
+DEFAULT_BUDGETS = {
+    "sankey_links": 40,
+    "treemap_categories_per_industry": 12,
+    "industry_bubbles": 40,
+    "seller_location_bubbles_per_industry": 8,
+    "sales_rep_series": 12,
+    "monthly_points": 120,
+}
+
+
+def top_n(frame, label, value, n, within=None):
+    """Keeps the `n` labels with the largest total `value` and merges the others into `OTHER`.
+
+    Labels are ranked over the whole frame, or separately per group of the `within` column.
+    Merged rows are summed per remaining non-numeric columns, so the numeric columns must be
+    additive, and the result is sorted by those other columns so that each "Other" row follows
+    the kept rows it belongs with. The frame is returned unchanged when nothing needs merging.
+    """
+    by = [within, label] if within is not None else [label]
+    # None and NaN are the same missing value; make them one group whatever the pandas version
+    missing = [column for column in by if frame[column].dtype == object and frame[column].hasnans]
+    if missing:
+        frame = frame.assign(**{column: frame[column].mask(frame[column].isna()) for column in missing})
+    totals = frame.groupby(by, observed=True, dropna=False)[value].sum().reset_index()
+    totals = totals.sort_values(value, ascending=False, kind="stable")
+    if within is not None:
+        rank = totals.groupby(within, observed=True, dropna=False).cumcount()
+    else:
+        rank = pd.Series(range(len(totals)), index=totals.index)
+    cut = totals[rank >= n]
+    if cut.empty:
+        return frame
+    merged = pd.MultiIndex.from_frame(frame[by]).isin(pd.MultiIndex.from_frame(cut[by]))
+    kept = frame[~merged]
+    other = frame[merged].assign(**{label: OTHER})
+    keys = [column for column in frame.columns if not pd.api.types.is_numeric_dtype(frame[column])]
+    other[keys] = other[keys].astype(object)
+    other = other.groupby(keys, sort=False, dropna=False).sum(numeric_only=True).reset_index()
+    result = pd.concat([kept.astype({column: object for column in keys}), other[frame.columns]], ignore_index=True)
+    others = [column for column in keys if column != label]
+    if others:
+        result = result.sort_values(others, kind="stable", ignore_index=True)
+    return result
+
+
+def coarsen_periods(frame, period, max_points):
+    """Sums the rows of `frame` into coarser periods until at most `max_points` are left.
+
+    `period` is a column of monthly pandas Periods; months become quarters and then years,
+    and the numeric columns are summed, so they must be additive. Unlike dropping points,
+    every month stays in the totals. Years are the coarsest, even when they do not fit.
+    The frame is returned unchanged when it already fits.
+    """
+    for frequency in COARSER_PERIODS:
+        if len(frame) <= max_points:
+            break
+        frame = (
+            frame.assign(**{period: frame[period].dt.asfreq(frequency)})
+            .groupby(period, sort=True)
+            .sum(numeric_only=True)
+            .reset_index()
+        )
+    return frame
+
+
+def payload_bytes(options):
+    """The size of the JSON that `st_echarts` sends to the browser for `options`."""
+    return len(json.dumps(options, default=str))
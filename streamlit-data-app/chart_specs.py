@@ -0,0 +1,130 @@
+import pandas as pd
+
+
+# Ring shared by the donut charts
+DONUT_SERIES = {
+    "type": "pie",
+    "radius": ["40%", "70%"],
+    "avoidLabelOverlap": False,
+    "label": {"show": False, "position": "center"},
+    "emphasis": {
+        "label": {"show": True, "fontSize": "20", "fontWeight": "bold"}
+    },
+    "labelLine": {"show": False},
+}
+
+
+def records(frame, **fields):
+    """One dict per row of `frame`, mapping each keyword to the value of the column it names.
+
+    `records(totals, value='gmv', name='industry_name')` gives `[{"value": ..., "name": ...}, ...]`.
+    Values are converted to Python scalars column by column, without a Python loop over rows.
+    """
+    columns = frame[list(fields.values())]
+    columns.columns = list(fields)
+    return columns.to_dict("records")
+
+
+def rows(frame, columns):
+    """One list per row of `frame` with the values of `columns`, e.g. the [x, y, size] of scatter points."""
+    return [list(row) for row in zip(*(frame[column].tolist() for column in columns))]
+
+
+def categories(column):
+    """The values of `column` as category axis labels."""
+    return column.astype(str).tolist()
+
+
+def nodes(frame, columns):
+    """The distinct values of `columns`, in order of first appearance, as graph nodes."""
+    return [{"name": name} for name in pd.unique(pd.concat([frame[column] for column in columns]))]
+
+
+def tree(frame, parent, child, value):
+    """Two-level tree data: one node per `parent` value with a leaf per row of its group.
+
+    Parents come in groupby order and leaves in the order of `frame`; rows with a missing
+    parent are dropped.
+    """
+    leaves = records(frame, name=child, value=value)
+    return [
+        {"name": name, "children": [leaves[i] for i in positions]}
+        for name, positions in frame.groupby(parent, observed=True).indices.items()
+    ]
+
+
+def donut_options(title, frame, name, value, series_name):
+    """A donut of `value` per `name`, with a legend of the names."""
+    return {
+        "title": {"text": title, "left": "center"},
+        "tooltip": {"trigger": "item", "formatter": "{a} <br/>{b} : {c} ({d}%)"},
+        "legend": {"orient": "vertical", "left": "left", "data": frame[name].tolist()},
+        "series": [{"name": series_name, **DONUT_SERIES, "data": records(frame, value=value, name=name)}],
+    }
+
+
+def scatter_options(title, series_name, frame, category, value, size, y_name):
+    """Scatter points of `value` per `category`, each carrying `size` as a third dimension."""
+    return {
+        "title": {"text": title, "left": "center"},
+        "tooltip": {"trigger": "item", "formatter": "{a} <br/>{b} : {c}"},
+        "xAxis": {"type": "category", "data": frame[category].tolist()},
+        "yAxis": {"type": "value", "name": y_name},
+        "series": [
+            {
+                "name": series_name,
+                "type": "scatter",
+                "symbolSize": 20,
+                "data": rows(frame, [category, value, size]),
+            }
+        ],
+    }
+
+
+def stacked_bar_options(title, frame, category, series, value, y_name):
+    """Bars of `value` per `category`, one stacked series per distinct `series` value.
+
+    Each series lists its own rows in the order of `frame`.
+    """
+    values = frame.groupby(series, observed=True, sort=False, dropna=False)[value].agg(list)
+    return {
+        "title": {"text": title, "left": "center", "top": "5%"},
+        "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
+        "legend": {"data": values.index.tolist(), "left": "left"},
+        "xAxis": {"type": "category", "data": categories(pd.Series(frame[category].unique()))},
+        "yAxis": {"type": "value", "name": y_name},
+        "series": [
+            {"name": name, "type": "bar", "stack": "total", "data": data}
+            for name, data in zip(values.index.tolist(), values.tolist())
+        ],
+    }
+
+
+def line_options(title, frame, category, value, series_name, percent=False):
+    """A single line of `value` per `category`; `percent` labels the values as percentages."""
+    return {
+        "title": {"text": title, "left": "center"},
+        "tooltip": {"trigger": "axis", "formatter": "{a} <br/>{b} : {c}%"} if percent else {"trigger": "axis"},
+        "xAxis": {"type": "category", "data": categories(frame[category])},
+        "yAxis": {"type": "value", "axisLabel": {"formatter": "{value}%"}} if percent else {"type": "value"},
+        "series": [{"name": series_name, "type": "line", "data": frame[value].tolist()}],
+    }
+
+
+def bar_line_options(title, frame, category, bars, line, line_axis=None):
+    """Bars of each `(name, column)` in `bars` with the `(name, column)` `line` on a second axis."""
+    line_name, line_column = line
+    return {
+        "title": {"text": title, "left": "center"},
+        "tooltip": {"trigger": "axis"},
+        "legend": {"data": [name for name, _ in bars] + [line_name], "left": "left"},
+        "xAxis": {"type": "category", "data": categories(frame[category])},
+        "yAxis": [
+            {"type": "value", "name": "Amount"},
+            {"type": "value", "name": line_name, "position": "right", **(line_axis or {})},
+        ],
+        "series": [
+            *({"name": name, "type": "bar", "data": frame[column].tolist()} for name, column in bars),
+            {"name": line_name, "type": "line", "yAxisIndex": 1, "data": frame[line_column].tolist()},
+        ],
+    }
@@ -0,0 +1,158 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """A small thread-safe pool of reusable Databricks SQL connections.
+
+    Connections are opened lazily up to `max_size`, handed back to the pool after
+    each query and closed once they have been idle for longer than `idle_timeout`
+    seconds. A connection that raised while in use, or that reports itself closed,
+    is discarded instead of being reused. When `validate(connection)` is given, a
+    connection idle for longer than `validate_after` seconds is checked with it before
+    reuse and discarded if it raises, which catches sessions the server has closed.
+    """
+
+    def __init__(self, connect, max_size=4, idle_timeout=300, wait_timeout=60, validate=None, validate_after=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.validate = validate
+        self.validate_after = validate_after
+        self._idle = []  # (connection, returned_at) pairs, most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._stats = {
+            "hits": 0,
+            "opens": 0,
+            "evictions": 0,
+            "discards": 0,
+            "waits": 0,
+            "wait_time_s": 0.0,
+        }
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for the duration of the `with` block."""
+        connection = self._acquire()
+        completed = False
+        try:
+            yield connection
+            completed = True
+        finally:
+            # Anything raised in the block, including interrupts, may leave the session mid-query
+            if completed:
+                self._release(connection)
+            else:
+                self._discard(connection)
+
+    def stats(self):
+        """Returns a snapshot of the pool counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        stats["max_size"] = self.max_size
+        stats["avg_wait_ms"] = (stats["wait_time_s"] / stats["waits"] * 1000) if stats["waits"] else 0.0
+        return stats
+
+    def close_all(self):
+        """Closes every idle connection; borrowed connections are closed when they come back."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+    def _acquire(self):
+        # Only acquires that found every slot taken count as waits
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            if not self._slots.acquire(timeout=self.wait_timeout):
+                raise TimeoutError(f"No Databricks connection became available within {self.wait_timeout}s")
+            waited = time.monotonic() - started
+            with self._lock:
+                self._stats["waits"] += 1
+                self._stats["wait_time_s"] += waited
+
+        try:
+            connection = self._take_idle()
+            if connection is not None:
+                return connection
+            connection = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["opens"] += 1
+        return connection
+
+    def _take_idle(self):
+        """Pops the most recently used healthy connection, evicting stale ones on the way."""
+        while True:
+            connection, idle_for = self._pop_idle()
+            if connection is None:
+                return None
+            # The check runs outside the lock, since it is a round trip to the server
+            if self.validate is None or idle_for <= self.validate_after or self._is_valid(connection):
+                with self._lock:
+                    self._stats["hits"] += 1
+                return connection
+            with self._lock:
+                self._stats["evictions"] += 1
+            self._close(connection)
+
+    def _pop_idle(self):
+        """Pops the most recently used open connection and how long it was idle, or (None, None)."""
+        now = time.monotonic()
+        stale = []
+        connection = idle_for = None
+        with self._lock:
+            while self._idle:
+                candidate, returned_at = self._idle.pop()
+                if now - returned_at > self.idle_timeout or not self._is_healthy(candidate):
+                    stale.append(candidate)
+                    continue
+                connection, idle_for = candidate, now - returned_at
+                break
+            # Anything older than the connection we picked has been idle even longer.
+            stale.extend(c for c, returned_at in self._idle if now - returned_at > self.idle_timeout)
+            self._idle = [(c, t) for c, t in self._idle if now - t <= self.idle_timeout]
+            self._stats["evictions"] += len(stale)
+        for candidate in stale:
+            self._close(candidate)
+        return connection, idle_for
+
+    def _release(self, connection):
+        if self._is_healthy(connection):
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        else:
+            with self._lock:
+                self._stats["discards"] += 1
+            self._close(connection)
+        self._slots.release()
+
+    def _discard(self, connection):
+        with self._lock:
+            self._stats["discards"] += 1
+        self._close(connection)
+        self._slots.release()
+
+    def _is_valid(self, connection):
+        try:
+            self.validate(connection)
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _is_healthy(connection):
+        return getattr(connection, "open", True)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
@@ -0,0 +1,36 @@
+# The account-owner names depend on the owner id, so carrying them adds no extra cells.
+CUBE_DIMENSIONS = [
+    "month",
+    "main_product_category",
+    "main_product_category_group",
+    "industry_name",
+    "seller_location_name",
+    "orderline_item_type_name",
+    "user_group_account_owner_id",
+    "account_owner_first_name",
+    "account_owner_last_name",
+    "order_status",
+]
+
+# Additive measures only: any roll-up of the cube is the sum of its cells.
+CUBE_MEASURES = {
+    "customer_amount": ("customer_amount", "sum"),
+    "supplier_amount": ("supplier_amount", "sum"),
+    "order_line_total": ("order_line_total", "sum"),
+    "line_count": ("orderline_id", "size"),
+}
+
+
+def build_cube(frame):
+    """Aggregates prepared line items into one row per combination of `CUBE_DIMENSIONS`.
+
+    Missing dimension values are kept as their own cells so that totals over the cube match
+    totals over the line items; roll-ups drop them the same way a groupby on the raw frame
+    would. Distinct counts (orders, user groups) are not additive and are not in the cube.
+    """
+    return frame.groupby(CUBE_DIMENSIONS, dropna=False, observed=True, sort=False).agg(**CUBE_MEASURES).reset_index()
+
+
+def roll_up(cube, by, measures=("customer_amount", "supplier_amount", "order_line_total", "line_count")):
+    """Sums the cube measures per group of `by`."""
+    return cube.groupby(by, observed=True)[list(measures)].sum().reset_index()
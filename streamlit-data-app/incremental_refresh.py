@@ -0,0 +1,92 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from cachetools import LRUCache
+
+from key_locks import KeyLocks
+
+
+# Order timestamps whose maximum is used as the change watermark of a line item.
+WATERMARK_COLUMNS = ["order_created_on", "order_accepted_on", "order_submitted_on", "order_completed_on"]
+MERGE_KEYS = ["order_id", "orderline_id"]
+# Full loads arrive ordered by line item id; merged frames are kept in the same order.
+ORDER_COLUMN = "orderline_id"
+
+
+@dataclass
+class Snapshot:
+    frame: pa.Table
+    watermark: object
+    full_loaded_at: float
+    refreshed_at: float
+
+
+def compute_watermark(frame, columns=WATERMARK_COLUMNS):
+    """Returns the latest change timestamp in the Arrow table `frame`, or None if there is none."""
+    present = [column for column in columns if column in frame.column_names]
+    if frame.num_rows == 0 or not present:
+        return None
+    maxima = [pd.to_datetime(pc.max(frame[column]).as_py(), errors="coerce", utc=True) for column in present]
+    maxima = [value for value in maxima if not pd.isna(value)]
+    return max(maxima) if maxima else None
+
+
+def merge_delta(previous, delta, keys=MERGE_KEYS):
+    """Replaces the rows of the Arrow table `previous` whose key appears in `delta`.
+
+    Every row of a changed key is replaced, so a key that legitimately has several rows in
+    a full load ends up with exactly the rows the delta returned for it.
+    """
+    if delta.num_rows == 0:
+        return previous
+    if previous.num_rows == 0:
+        return delta
+    changed = delta.select(keys).group_by(keys).aggregate([])
+    unchanged = previous.join(changed, keys=keys, join_type="left anti").select(previous.column_names)
+    merged = pa.concat_tables([unchanged, delta.select(previous.column_names)], promote_options="default")
+    if ORDER_COLUMN in merged.column_names:
+        merged = merged.sort_by(ORDER_COLUMN)
+    return merged
+
+
+class SnapshotStore:
+    """Keeps the last loaded frame per filter key so that refreshes only fetch changed rows.
+
+    A key is fully reloaded the first time it is requested and again once its last full
+    load is older than `full_reload_interval` seconds, which also picks up deletions and
+    edits that did not move the watermark. In between, `load_delta(since)` fetches the rows
+    changed after the stored watermark minus `overlap` and merges them in.
+    """
+
+    def __init__(self, max_entries=8, full_reload_interval=3600, overlap=timedelta(minutes=5)):
+        self.full_reload_interval = full_reload_interval
+        self.overlap = overlap
+        self._snapshots = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        self._key_locks = KeyLocks()
+
+    def refresh(self, key, load_full, load_delta):
+        """Returns an up-to-date frame for `key`, loading as little as possible."""
+        with self._key_locks(key):
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+            now = time.time()
+            if (
+                snapshot is None
+                or snapshot.watermark is None
+                or now - snapshot.full_loaded_at > self.full_reload_interval
+            ):
+                frame = load_full()
+                full_loaded_at = now
+            else:
+                delta = load_delta(snapshot.watermark - self.overlap)
+                frame = merge_delta(snapshot.frame, delta)
+                full_loaded_at = snapshot.full_loaded_at
+            with self._lock:
+                self._snapshots[key] = Snapshot(frame, compute_watermark(frame), full_loaded_at, now)
+            return frame
@@ -0,0 +1,33 @@
+import threading
+from contextlib import contextmanager
+
+
+class KeyLocks:
+    """One lock per key, kept only while a thread holds or waits for it.
+
+    `with key_locks(key):` serializes the threads working on the same key. A key's lock is
+    dropped as soon as its last user leaves, so the locks of filter keys that are no longer
+    used do not pile up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}  # key -> [lock, number of threads holding or waiting for it]
+
+    @contextmanager
+    def __call__(self, key):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._locks)
@@ -0,0 +1,139 @@
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+
+# Format name -> file extension and MIME type
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Name prefix of the export files, which `remove_stale_exports` only deletes
+FILE_PREFIX = "line_items_"
+
+# Rows per Excel worksheet, header included; longer exports continue on further sheets
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_ILLEGAL_CHARACTERS = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+
+def write_export(pages, sink, file_format, columns, on_page=None):
+    """Writes the Arrow tables `pages` to the binary file `sink` as one `file_format` file.
+
+    Only `columns` are written, in that order. Pages are written as they arrive and only one
+    is held at a time: Parquet row groups straight from Arrow, CSV incrementally and Excel
+    through a write-only workbook. `on_page(rows_written)` is called after every page.
+    Returns the number of rows written.
+    """
+    writer = {"CSV": _CsvWriter, "Parquet": _ParquetWriter, "Excel": _ExcelWriter}[file_format](sink, columns)
+    rows = 0
+    schema = None
+    for page in pages:
+        page = page.select(columns)
+        if schema is None:
+            schema = page.schema
+        elif page.schema != schema:
+            page = page.cast(schema)
+        writer.write(page)
+        rows += page.num_rows
+        if on_page is not None:
+            on_page(rows)
+    if schema is None:
+        writer.write(pa.table({column: pa.array([]) for column in columns}))
+    writer.close()
+    return rows
+
+
+def remove_stale_exports(directory, max_age):
+    """Deletes the export files in `directory` last written more than `max_age` seconds ago.
+
+    Only files named with `FILE_PREFIX` are considered, so other files in the directory are
+    left alone. Returns the number of files deleted. Files another process deletes first are
+    skipped.
+    """
+    removed = 0
+    cutoff = time.time() - max_age
+    for name in os.listdir(directory):
+        if not name.startswith(FILE_PREFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+class _CsvWriter:
+    def __init__(self, sink, columns):
+        self.sink = sink
+        self.writer = None
+
+    def write(self, page):
+        if self.writer is None:
+            self.writer = pa_csv.CSVWriter(self.sink, page.schema)
+        self.writer.write_table(page)
+
+    def close(self):
+        self.writer.close()
+
+
+class _ParquetWriter:
+    def __init__(self, sink, columns):
+        self.sink = sink
+        self.writer = None
+
+    def write(self, page):
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.sink, page.schema)
+        self.writer.write_table(page)
+
+    def close(self):
+        self.writer.close()
+
+
+class _ExcelWriter:
+    def __init__(self, sink, columns):
+        from openpyxl import Workbook
+
+        self.sink = sink
+        self.columns = columns
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = EXCEL_MAX_ROWS
+
+    def write(self, page):
+        for i, field in enumerate(page.schema):
+            column = page[i]
+            if pa.types.is_dictionary(field.type):
+                column = column.cast(field.type.value_type)
+            # Excel has no time zones; timestamps are written as UTC wall-clock times
+            if pa.types.is_timestamp(column.type) and column.type.tz is not None:
+                column = column.cast(pa.timestamp(column.type.unit))
+            # Control characters are not allowed in the worksheet XML
+            if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+                column = pc.replace_substring_regex(column, EXCEL_ILLEGAL_CHARACTERS, "")
+            page = page.set_column(i, field.name, column)
+        for row in zip(*(column.to_pylist() for column in page.columns)):
+            if self.sheet_rows == EXCEL_MAX_ROWS:
+                self._add_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+
+    def close(self):
+        if self.sheet is None:
+            self._add_sheet()
+        self.workbook.save(self.sink)
+
+    def _add_sheet(self):
+        sheets = len(self.workbook.worksheets)
+        self.sheet = self.workbook.create_sheet("Line items" if sheets == 0 else f"Line items ({sheets + 1})")
+        self.sheet.append(self.columns)
+        self.sheet_rows = 1
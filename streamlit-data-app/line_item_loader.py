@@ -0,0 +1,106 @@
+import pyarrow.compute as pc
+
+import tracing
+from queries import LINE_ITEM_FROM, LINE_ITEM_WHERE, build_filter_clause, build_select_list
+
+
+class PartialLoadError(RuntimeError):
+    """Raised when a line-item load fails part way; `pages` and `rows` had been loaded."""
+
+    def __init__(self, message, pages=0, rows=0):
+        super().__init__(message)
+        self.pages = pages
+        self.rows = rows
+
+
+def iter_pages(executor, start_date, end_date, categories=None, changed_since=None, columns=None, batch_size=5000, label="line_item_page", stop=None):
+    """Yields the order line items of one date range page by page, seeking past the last `oli.id` seen.
+
+    Each page resumes with `oli.id > last_id` instead of an OFFSET, so the warehouse never
+    rebuilds and skips earlier rows and a full load scales linearly with the table size.
+    `executor` is anything with `execute(query, parameters)` returning a PyArrow Table, such
+    as a `query_executor.QueryExecutor`; pages run as queries labelled `label`. `columns` must
+    include `orderline_id` when given. A failed page raises `PartialLoadError`, and so does
+    setting the `threading.Event` `stop`, which is checked before every page.
+
+    `oli.id` need not be unique in the result: a full page holds back the rows of its last id,
+    which the next page then reads in full, so a join that repeats an order line never has its
+    rows split across a page boundary. `batch_size` must exceed the rows of any one id.
+    """
+    filter_clause, filter_parameters = build_filter_clause(start_date, end_date, categories, changed_since)
+    select_list = build_select_list(columns)
+    last_id = None
+    pages = 0
+    rows = 0
+
+    while True:
+        if stop is not None and stop.is_set():
+            raise PartialLoadError(
+                f"Line-item shard {start_date}..{end_date} was stopped after {pages} pages ({rows} rows)",
+                pages=pages,
+                rows=rows,
+            )
+        seek_clause = "AND oli.id > :last_id" if last_id is not None else ""
+        parameters = dict(filter_parameters)
+        if last_id is not None:
+            parameters["last_id"] = last_id
+        query = f"""
+            SELECT
+                {select_list}
+            FROM {LINE_ITEM_FROM}
+            WHERE {LINE_ITEM_WHERE}
+                {filter_clause}
+                {seek_clause}
+            ORDER BY oli.id
+            LIMIT {batch_size}
+        """
+
+        with tracing.span(label, page=pages + 1) as attributes:
+            try:
+                batch_data = executor.execute(query, parameters or None, label=label)
+            except Exception as e:
+                raise PartialLoadError(
+                    f"Line-item shard {start_date}..{end_date} failed after {pages} pages ({rows} rows): {e}",
+                    pages=pages,
+                    rows=rows,
+                ) from e
+            attributes["rows"] = batch_data.num_rows
+        if batch_data.num_rows == 0:
+            break
+        full_page = batch_data.num_rows >= batch_size
+        if full_page:
+            batch_data = _without_last_id(batch_data, start_date, end_date, batch_size)
+        pages += 1
+        rows += batch_data.num_rows
+        # as_py() gives a Python int, which the connector can bind; numpy integers are rejected
+        last_id = batch_data['orderline_id'][-1].as_py()
+        yield batch_data
+        if not full_page:
+            break
+
+
+def _without_last_id(batch_data, start_date, end_date, batch_size):
+    """Drops the trailing rows that share the page's last `orderline_id`; the rows are ordered by it."""
+    ids = batch_data['orderline_id']
+    trailing = pc.sum(pc.equal(ids, ids[-1])).as_py()
+    if trailing == batch_data.num_rows:
+        raise PartialLoadError(
+            f"Line-item shard {start_date}..{end_date}: order line {ids[-1].as_py()} has at least "
+            f"{batch_size} rows, more than one page holds"
+        )
+    return batch_data.slice(0, batch_data.num_rows - trailing)
+
+
+def load_shard(executor, start_date, end_date, categories=None, changed_since=None, columns=None, batch_size=5000, on_page=None, stop=None):
+    """Loads the order line items of one shard with `iter_pages`.
+
+    A failed page raises `PartialLoadError`, so a shard is either loaded completely or not at
+    all, and `on_page(rows)` is called after every page. Setting `stop` abandons the shard
+    before its next page. Returns the pages as a list of tables.
+    """
+    batches = []
+    for batch_data in iter_pages(executor, start_date, end_date, categories, changed_since, columns, batch_size, stop=stop):
+        batches.append(batch_data)
+        if on_page is not None:
+            on_page(batch_data.num_rows)
+    return batches
@@ -0,0 +1,108 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Low-cardinality text columns, stored once per distinct value as dictionaries
+DICTIONARY_COLUMNS = [
+    "order_status",
+    "main_product_category",
+    "main_product_category_group",
+    "user_address_state",
+    "industry_name",
+    "seller_name",
+    "seller_location_name",
+    "orderline_item_type_name",
+    "account_owner_first_name",
+    "account_owner_last_name",
+]
+
+# Column name -> Arrow type for the measures and dates, which arrive as decimals and dates
+TYPED_COLUMNS = {
+    "orderline_quantity": pa.float64(),
+    "orderline_rate": pa.float64(),
+    "order_line_total": pa.float64(),
+    "orderline_platform_fee_percent": pa.float64(),
+    "orderline_tax": pa.float64(),
+    "order_group_removal_fee": pa.float64(),
+    "order_group_shift_count": pa.int32(),
+    "order_end_date": pa.timestamp("us"),
+    "order_group_start_date": pa.timestamp("us"),
+    "order_group_end_date": pa.timestamp("us"),
+}
+
+
+def compact(table):
+    """Applies the line-item schema to the Arrow table `table` once, at load.
+
+    Dimensions become dictionary columns (pandas categoricals), decimals become float64 and
+    dates become timestamps, so later conversions and reruns have nothing left to coerce.
+    Columns that are missing or already typed are left as they are.
+    """
+    for index, field in enumerate(table.schema):
+        column = table.column(index)
+        if field.name in DICTIONARY_COLUMNS and pa.types.is_string(field.type):
+            column = pc.dictionary_encode(column)
+        elif field.name in TYPED_COLUMNS and field.type != TYPED_COLUMNS[field.name]:
+            target = TYPED_COLUMNS[field.name]
+            column = pc.cast(column, target, safe=not pa.types.is_floating(target))
+        else:
+            continue
+        table = table.set_column(index, field.name, column)
+    return table
+
+
+def empty_table(columns):
+    """An empty line-item table with `columns`, typed as `compact` would type them.
+
+    Columns without a compact type are strings, so a load that returned nothing can still be
+    filtered and selected like a loaded one.
+    """
+    return pa.table({
+        name: pa.array([], type=pa.dictionary(pa.int32(), pa.string()) if name in DICTIONARY_COLUMNS else TYPED_COLUMNS.get(name, pa.string()))
+        for name in columns
+    })
+
+
+def content_version(table):
+    """A cheap summary of `table` that changes when its rows do: the row count, the latest value
+    of every timestamp column and the sum of every float column.
+
+    Rows added, removed or re-timestamped, and changed measures, all change it; an edit that
+    touches only text columns does not.
+    """
+    version = [table.num_rows]
+    for field in table.schema:
+        if pa.types.is_timestamp(field.type):
+            version.append(pc.max(table[field.name]).as_py())
+        elif pa.types.is_floating(field.type):
+            # Rounded, so that summing in a different order does not look like a change
+            version.append(round(pc.sum(table[field.name]).as_py() or 0.0, 4))
+    return tuple(version)
+
+
+def memory_report(before, after):
+    """Compares the in-memory size of a table before and after `compact`."""
+    saved = before.nbytes - after.nbytes
+    return {
+        "rows": after.num_rows,
+        "bytes_before": before.nbytes,
+        "bytes_after": after.nbytes,
+        "saved_pct": round(100 * saved / before.nbytes, 1) if before.nbytes else 0.0,
+        "largest_columns": sorted(
+            ((name, after.column(name).nbytes) for name in after.column_names),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:5],
+    }
+
+
+def fanout_report(table, key="orderline_id"):
+    """Checks that `table` has one row per `key`, i.e. that no join multiplied the line items."""
+    rows = table.num_rows
+    distinct = pc.count_distinct(table[key]).as_py() if rows else 0
+    return {
+        "rows": rows,
+        "distinct_lines": distinct,
+        "duplicate_rows": rows - distinct,
+        "fanout_ratio": round(rows / distinct, 4) if distinct else 1.0,
+    }
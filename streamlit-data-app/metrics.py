@@ -0,0 +1,73 @@
+import pandas as pd
+
+
+NUMERIC_COLUMNS = ["order_line_total", "orderline_rate", "orderline_quantity", "orderline_platform_fee_percent"]
+COMPLETE = "COMPLETE"
+
+
+def prepare_line_items(frame):
+    """Coerces the line-item columns once and derives the amounts every metric is built from.
+
+    - `supplier_amount`: rate x quantity, what the supplier is paid
+    - `customer_amount`: supplier amount plus the platform fee, i.e. GMV
+    - `month`: the `order_end_date` month as a pandas Period
+
+    Columns already typed by `line_item_schema.compact` are not coerced again.
+    """
+    frame = frame.copy()
+    for column in NUMERIC_COLUMNS:
+        if frame[column].dtype != "float64":
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+    if not pd.api.types.is_datetime64_any_dtype(frame["order_end_date"]):
+        frame["order_end_date"] = pd.to_datetime(frame["order_end_date"], errors="coerce")
+    frame["month"] = frame["order_end_date"].dt.to_period("M")
+    frame["supplier_amount"] = frame["orderline_rate"] * frame["orderline_quantity"]
+    frame["customer_amount"] = frame["supplier_amount"] * (1 + frame["orderline_platform_fee_percent"] * 0.01)
+    return frame
+
+
+def completed(frame):
+    """Returns the line items of completed orders."""
+    return frame[frame["order_status"] == COMPLETE]
+
+
+def take_rate(customer_amount, supplier_amount):
+    """Share of the customer amount kept by the platform; 0 when nothing was sold."""
+    return float((customer_amount - supplier_amount) / customer_amount) if customer_amount != 0 else 0
+
+
+def summarize(frame):
+    """Computes the KPI card values for a prepared frame."""
+    complete = completed(frame)
+    customer_amount = complete["customer_amount"].sum()
+    supplier_amount = complete["supplier_amount"].sum()
+    order_count = frame["order_id"].nunique()
+    line_total = frame["order_line_total"].sum()
+    return {
+        "order_count": order_count,
+        "line_total": line_total,
+        "gmv": customer_amount,
+        "net_revenue": customer_amount - supplier_amount,
+        "take_rate": take_rate(customer_amount, supplier_amount),
+        "average_order_value": line_total / order_count if order_count != 0 else 0,
+    }
+
+
+def totals_by(frame, by):
+    """Sums GMV and net revenue per group of `by`, returned as regular columns."""
+    totals = frame.groupby(by, observed=True)[["customer_amount", "supplier_amount"]].sum()
+    totals["gmv"] = totals["customer_amount"]
+    totals["net_revenue"] = totals["customer_amount"] - totals["supplier_amount"]
+    return totals[["gmv", "net_revenue"]].reset_index()
+
+
+def ratios(totals):
+    """Average order value and take rate per row of summed totals, rounded to two decimals.
+
+    `totals` needs `order_line_total`, `order_count`, `customer_amount` and `supplier_amount`.
+    """
+    average_order_value = (totals["order_line_total"] / totals["order_count"]).where(totals["order_count"] != 0, 0)
+    return pd.DataFrame({
+        "avg_order_value": average_order_value.round(2),
+        "avg_take_rate": ((totals["customer_amount"] - totals["supplier_amount"]) / totals["customer_amount"]).round(2),
+    })
@@ -0,0 +1,48 @@
+import threading
+
+from cachetools import TTLCache
+
+
+class PayloadCache:
+    """A bounded, thread-safe memo of computed widget payloads shared by every session.
+
+    Entries are evicted least recently used once `maxsize` is reached and expire `ttl`
+    seconds after they were stored. Keys should start with the data version so that new
+    data never hits an entry computed from old data. Values are returned as stored, so
+    callers must not modify them.
+    """
+
+    def __init__(self, maxsize=256, ttl=600):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get_or_compute(self, key, compute):
+        """Returns the payload stored under `key`, calling `compute()` to fill it on a miss."""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._stats["misses"] += 1
+            else:
+                self._stats["hits"] += 1
+                return value
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+        return value
+
+    def stats(self):
+        """Returns a snapshot of the cache counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["maxsize"] = self._entries.maxsize
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drops every entry; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,29 @@
+from incremental_refresh import MERGE_KEYS, ORDER_COLUMN, WATERMARK_COLUMNS
+from queries import LINE_ITEM_SELECT
+
+
+# Widget name -> line-item columns it reads, filled in by `register_widget`
+WIDGET_COLUMNS = {}
+
+# Columns the loader itself needs: the seek key, the merge keys and the change watermark
+LOADER_COLUMNS = [ORDER_COLUMN, *MERGE_KEYS, *WATERMARK_COLUMNS]
+
+
+def register_widget(name, columns):
+    """Declares the line-item columns widget `name` reads; registering again replaces them."""
+    unknown = [column for column in columns if column not in LINE_ITEM_SELECT]
+    if unknown:
+        raise ValueError(f"Widget {name!r} reads unknown line-item columns: {unknown}")
+    WIDGET_COLUMNS[name] = list(columns)
+
+
+def required_columns(widgets=None):
+    """Returns the columns to fetch for `widgets` (every registered widget when None).
+
+    The result is a tuple in `LINE_ITEM_SELECT` order so it can be used as a cache key.
+    """
+    names = WIDGET_COLUMNS if widgets is None else widgets
+    needed = set(LOADER_COLUMNS)
+    for name in names:
+        needed.update(WIDGET_COLUMNS[name])
+    return tuple(column for column in LINE_ITEM_SELECT if column in needed)
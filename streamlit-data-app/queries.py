@@ -0,0 +1,211 @@
+import pandas as pd
+
+
+SCHEMA = "bronze_prod.postgres_prod_restricted_bronze_public"
+
+# Joins shared by every query over the order line items. Every join follows a foreign key
+# to at most one row, so the result has exactly one row per order line.
+LINE_ITEM_FROM = """{schema}.api_orderlineitem oli
+LEFT JOIN {schema}.api_order o
+    ON oli.order_id = o.id
+LEFT JOIN {schema}.api_ordergroup og
+    ON o.order_group_id = og.id
+LEFT JOIN {schema}.api_sellerproductsellerlocation spsl
+    ON og.seller_product_seller_location_id = spsl.id
+LEFT JOIN {schema}.api_sellerproduct sp
+    ON spsl.seller_product_id = sp.id
+LEFT JOIN {schema}.api_product p
+    ON sp.product_id = p.id
+LEFT JOIN {schema}.api_mainproduct mp
+    ON p.main_product_id = mp.id
+LEFT JOIN {schema}.api_mainproductcategory mpc
+    ON mp.main_product_category_id = mpc.id
+LEFT JOIN {schema}.api_mainproductcategorygroup mpcg
+    ON mpc.group_id = mpcg.id
+LEFT JOIN {schema}.api_useraddress ua
+    ON og.user_address_id = ua.id
+LEFT JOIN {schema}.api_user u
+    ON o.created_by_id = u.id
+LEFT JOIN {schema}.api_usergroup ug
+    ON u.user_group_id = ug.id
+LEFT JOIN {schema}.api_seller s
+    ON sp.seller_id = s.id
+LEFT JOIN {schema}.api_user uo
+    ON ug.account_owner_id = uo.id
+LEFT JOIN {schema}.api_industry i
+    ON ug.industry_id = i.id
+LEFT JOIN {schema}.api_sellerlocation sl
+    ON spsl.seller_location_id = sl.id
+LEFT JOIN {schema}.api_orderlineitemtype olit
+    ON oli.order_line_item_type_id = olit.id
+""".format(schema=SCHEMA)
+
+LINE_ITEM_WHERE = """o.status IN ('COMPLETE', 'PENDING', 'SCHEDULED')
+    AND o.status != 'CANCELLED'"""
+
+# Column name -> SQL expression for every line-item column, in the raw table's order
+LINE_ITEM_SELECT = {
+    "user_group_id": "ug.id",
+    "ordergroup_id": "og.id",
+    "project_id": "og.project_id",
+    "order_group_agreement": "og.agreement",
+    "order_group_code": "og.code",
+    "order_group_end_date": "og.end_date",
+    "order_group_is_delivery": "og.is_delivery",
+    "order_group_placement_details": "og.placement_details",
+    "order_group_removal_fee": "og.removal_fee",
+    "order_group_shift_count": "og.shift_count",
+    "order_group_start_date": "og.start_date",
+    "order_id": "o.id",
+    "order_accepted_on": "o.accepted_on",
+    "order_billing_comments_internal_use": "o.billing_comments_internal_use",
+    "order_code": "o.code",
+    "order_completed_on": "o.completed_on",
+    "order_created_on": "o.created_on",
+    "order_end_date": "o.end_date",
+    "order_schedule_window": "o.schedule_window",
+    "order_status": "o.status",
+    "order_submitted_on": "o.submitted_on",
+    "order_created_by": "o.created_by_id",
+    "submitted_by_id": "o.submitted_by_id",
+    "orderline_id": "oli.id",
+    "orderline_backbill": "oli.backbill",
+    "orderline_is_flat_rate": "oli.is_flat_rate",
+    "orderline_paid": "oli.paid",
+    "orderline_quantity": "oli.quantity",
+    "orderline_rate": "oli.rate",
+    "order_line_total": "oli.rate * oli.quantity",
+    "orderline_platform_fee_percent": "oli.platform_fee_percent",
+    "orderline_tax": "oli.tax",
+    "stripe_invoice_line_item_id": "oli.stripe_invoice_line_item_id",
+    "orderline_type": "oli.order_line_item_type_id",
+    "main_product": "mp.name",
+    "main_product_category": "mpc.name",
+    "main_product_category_group": "mpcg.name",
+    "user_address_state": "ua.state",
+    "user_is_staff": "u.is_staff",
+    "user_first_name": "u.first_name",
+    "user_last_name": "u.last_name",
+    "industry_name": "i.name",
+    "user_group_name": "ug.name",
+    "user_group_account_owner_id": "ug.account_owner_id",
+    "account_owner_first_name": "uo.first_name",
+    "account_owner_last_name": "uo.last_name",
+    "seller_name": "s.name",
+    "seller_location_name": "sl.name",
+    "orderline_item_type_name": "olit.name",
+}
+
+# SQL for the change watermark, matching incremental_refresh.WATERMARK_COLUMNS
+WATERMARK_EXPRESSION = "greatest(o.created_on, o.accepted_on, o.submitted_on, o.completed_on)"
+
+# Cheap query whose result changes whenever an order is added, changed or deleted; used as
+# the data version of memoized payloads
+DATA_VERSION_QUERY = f"""
+    SELECT max({WATERMARK_EXPRESSION}) AS watermark, count(*) AS order_count
+    FROM {SCHEMA}.api_order o
+"""
+
+
+def build_filter_clause(start_date=None, end_date=None, categories=None, changed_since=None):
+    """Builds the extra WHERE conditions and bound parameters for the dashboard filters.
+
+    Dates are compared at day granularity so the result is a superset of the rows the
+    dashboard keeps after its own `order_end_date` filter. `changed_since` restricts the
+    query to orders whose watermark is later than the given timestamp.
+    """
+    conditions = []
+    parameters = {}
+    if changed_since is not None:
+        conditions.append(f"AND {WATERMARK_EXPRESSION} > :changed_since")
+        parameters["changed_since"] = pd.Timestamp(changed_since).to_pydatetime()
+    if start_date is not None:
+        conditions.append("AND o.end_date >= :start_date")
+        parameters["start_date"] = pd.Timestamp(start_date).date()
+    if end_date is not None:
+        conditions.append("AND o.end_date < date_add(:end_date, 1)")
+        parameters["end_date"] = pd.Timestamp(end_date).date()
+    if categories:
+        markers = []
+        for i, category in enumerate(categories):
+            markers.append(f":category_{i}")
+            parameters[f"category_{i}"] = category
+        conditions.append(f"AND mpc.name IN ({', '.join(markers)})")
+    return "\n    ".join(conditions), parameters
+
+
+def build_select_list(columns=None):
+    """Builds the SELECT list for `columns`, or for every column of `LINE_ITEM_SELECT` when None.
+
+    Columns keep the order of `LINE_ITEM_SELECT` whatever order they are requested in.
+    """
+    names = LINE_ITEM_SELECT if columns is None else [name for name in LINE_ITEM_SELECT if name in columns]
+    return ",\n    ".join(f"{LINE_ITEM_SELECT[name]} AS {name}" for name in names)
+
+
+def split_date_range(start_date, end_date, shards):
+    """Splits [start_date, end_date] into up to `shards` contiguous, non-overlapping day ranges.
+
+    Each range can be loaded by its own query with `build_filter_clause`; together they
+    return exactly the rows of the whole range. Open-ended ranges are not split.
+    """
+    if start_date is None or end_date is None or shards <= 1:
+        return [(start_date, end_date)]
+    start_date = pd.Timestamp(start_date).normalize()
+    end_date = pd.Timestamp(end_date).normalize()
+    days = (end_date - start_date).days + 1
+    if days <= 1:
+        return [(start_date.date(), end_date.date())]
+    shards = min(shards, days)
+    bounds = [start_date + pd.Timedelta(days=days * i // shards) for i in range(shards + 1)]
+    return [
+        (bounds[i].date(), (bounds[i + 1] - pd.Timedelta(days=1)).date())
+        for i in range(shards)
+    ]
+
+
+def _column_expression(column):
+    if column not in LINE_ITEM_SELECT:
+        raise ValueError(f"Unknown line-item column: {column!r}")
+    return LINE_ITEM_SELECT[column]
+
+
+def build_search_clause(column, text):
+    """Builds a case-insensitive "`column` contains `text`" condition and its bound parameter.
+
+    Returns an empty clause when `text` is empty. LIKE wildcards in `text` match literally.
+    """
+    if not text:
+        return "", {}
+    pattern = text.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"AND lower(CAST({_column_expression(column)} AS STRING)) LIKE :search", {"search": f"%{pattern}%"}
+
+
+def build_page_query(columns, filter_clause="", sort_by=None, descending=False, limit=100, offset=0):
+    """Builds the query for one page of line items, ordered by `sort_by` and then by `oli.id`.
+
+    The `oli.id` tie-break gives every row a fixed position, so consecutive pages neither
+    overlap nor skip rows. Only `columns` are selected (see `build_select_list`).
+    """
+    order_by = ["oli.id"]
+    if sort_by is not None:
+        order_by.insert(0, f"{_column_expression(sort_by)} {'DESC' if descending else 'ASC'}")
+    return f"""
+        SELECT
+            {build_select_list(columns)}
+        FROM {LINE_ITEM_FROM}
+        WHERE {LINE_ITEM_WHERE}
+            {filter_clause}
+        ORDER BY {', '.join(order_by)}
+        LIMIT {int(limit)} OFFSET {int(offset)}
+    """
+
+
+def build_count_query(filter_clause=""):
+    """Builds the query counting the line items that match `filter_clause`."""
+    return f"""
+        SELECT count(*) AS line_count
+        FROM {LINE_ITEM_FROM}
+        WHERE {LINE_ITEM_WHERE}
+            {filter_clause}
+    """
@@ -0,0 +1,118 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+
+import tracing
+
+
+class QueryTimeout(TimeoutError):
+    """Raised when a query is cancelled for running longer than its timeout."""
+
+
+class QueryExecutor:
+    """Runs Databricks SQL queries on a bounded thread pool, one pooled connection per query.
+
+    `submit` returns a `concurrent.futures.Future` of the Arrow result, so independent
+    queries (date-range shards, lookups, per-chart aggregates) run side by side and a load
+    takes about as long as its slowest query. `max_workers` should be smaller than the
+    connection pool, so that queries run with `execute` on other threads still find a free
+    connection while every worker holds one. A query that runs longer than its timeout is
+    cancelled on the warehouse and raises `QueryTimeout`. Tasks run in a copy of the
+    submitting context, so their tracing spans join its trace.
+    """
+
+    def __init__(self, connection_pool, max_workers=4, timeout=300, query_log=None):
+        self.connection_pool = connection_pool
+        self.timeout = timeout
+        self.query_log = query_log
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="databricks-query")
+
+    def execute(self, query, parameters=None, timeout=None, label=None):
+        """Runs `query` on the calling thread and returns its result as a PyArrow Table.
+
+        When the executor has a `query_log`, the execution is recorded in it under `label`,
+        whether it succeeds or not.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        trace = tracing.current_trace()
+        entry = {
+            "label": label or "query",
+            "query_id": None,
+            "trace_id": trace.trace_id if trace is not None else None,
+            "thread": threading.current_thread().name,
+            "rows": 0,
+            "bytes": 0,
+            "wait_s": None,
+            "first_batch_s": None,
+            "total_s": None,
+            "status": "ok",
+            "error": None,
+        }
+        started = time.perf_counter()
+        try:
+            result = self._execute(query, parameters, timeout, entry, started)
+            entry["rows"] = result.num_rows
+            entry["bytes"] = result.nbytes
+            return result
+        except Exception as e:
+            entry["status"] = "timeout" if isinstance(e, QueryTimeout) else "error"
+            entry["error"] = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            entry["total_s"] = time.perf_counter() - started
+            if self.query_log is not None:
+                self.query_log.record(entry)
+
+    def _execute(self, query, parameters, timeout, entry, started):
+        with self.connection_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                entry["wait_s"] = time.perf_counter() - started
+                timed_out = threading.Event()
+
+                def cancel():
+                    timed_out.set()
+                    cursor.cancel()
+
+                timer = threading.Timer(timeout, cancel)
+                timer.daemon = True
+                timer.start()
+                try:
+                    with tracing.span("query.execute"):
+                        cursor.execute(query, parameters)
+                    entry["query_id"] = cursor.query_id
+                    with tracing.span("query.fetch") as attributes:
+                        # The first batch is fetched on its own to time it separately
+                        result = cursor.fetchmany_arrow(cursor.arraysize)
+                        entry["first_batch_s"] = time.perf_counter() - started
+                        rest = cursor.fetchall_arrow()
+                        if rest.num_rows:
+                            result = pa.concat_tables([result, rest])
+                        attributes["rows"] = result.num_rows
+                        attributes["bytes"] = result.nbytes
+                except Exception as e:
+                    if timed_out.is_set():
+                        raise QueryTimeout(f"Query cancelled after {timeout}s") from e
+                    raise
+                finally:
+                    timer.cancel()
+                if timed_out.is_set():
+                    raise QueryTimeout(f"Query cancelled after {timeout}s")
+                return result
+
+    def submit(self, query, parameters=None, timeout=None, label=None):
+        """Schedules `query` on the pool and returns a Future of its PyArrow Table."""
+        return self._workers.submit(contextvars.copy_context().run, self.execute, query, parameters, timeout, label)
+
+    def submit_task(self, task, *args, **kwargs):
+        """Schedules `task(*args, **kwargs)`, e.g. a loop of dependent `execute` calls.
+
+        Tasks must not wait on other futures of this executor, or the pool can deadlock.
+        """
+        return self._workers.submit(contextvars.copy_context().run, task, *args, **kwargs)
+
+    def shutdown(self):
+        """Stops accepting work and waits for the running queries to finish."""
+        self._workers.shutdown(wait=True)
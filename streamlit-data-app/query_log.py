@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import deque
+
+
+class QueryLog:
+    """A rolling, thread-safe record of the last `maxlen` query executions, shared by every session.
+
+    `QueryExecutor` records one entry per query: its label, the Databricks query id, rows and
+    Arrow bytes received, the time spent waiting for a connection, the time to the first
+    result batch and in total, and how it ended ("ok", "error" or "timeout"). Completed
+    line-item loads and loads that stopped part way through are recorded separately, see
+    `record_load` and `record_partial_load`.
+    """
+
+    def __init__(self, maxlen=1000):
+        self._entries = deque(maxlen=maxlen)
+        self._loads = deque(maxlen=100)
+        self._partial_loads = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def record(self, entry):
+        """Adds the query record `entry`, a dict, stamping it with the time it was recorded."""
+        entry = dict(entry, recorded_at=time.time())
+        with self._lock:
+            self._entries.append(entry)
+
+    def record_load(self, details):
+        """Adds a record of a completed line-item load, such as its size in memory."""
+        details = dict(details, recorded_at=time.time())
+        with self._lock:
+            self._loads.append(details)
+
+    def record_partial_load(self, details):
+        """Adds a record of a line-item load that failed after some of its pages were loaded."""
+        details = dict(details, recorded_at=time.time())
+        with self._lock:
+            self._partial_loads.append(details)
+
+    def entries(self, limit=None):
+        """Returns the recorded queries, newest first."""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit is not None else entries
+
+    def loads(self, limit=None):
+        """Returns the recorded line-item loads, newest first."""
+        with self._lock:
+            loads = list(self._loads)
+        loads.reverse()
+        return loads[:limit] if limit is not None else loads
+
+    def partial_loads(self):
+        """Returns the recorded partial loads, newest first."""
+        with self._lock:
+            loads = list(self._partial_loads)
+        loads.reverse()
+        return loads
+
+    def summary(self):
+        """Summarizes the recorded queries per label: counts, failures, rows, bytes and timings."""
+        groups = {}
+        for entry in self.entries():
+            groups.setdefault(entry["label"], []).append(entry)
+        summary = {}
+        for label, entries in sorted(groups.items()):
+            first_batch = [entry["first_batch_s"] for entry in entries if entry["first_batch_s"] is not None]
+            summary[label] = {
+                "queries": len(entries),
+                "errors": sum(entry["status"] == "error" for entry in entries),
+                "timeouts": sum(entry["status"] == "timeout" for entry in entries),
+                "rows": sum(entry["rows"] for entry in entries),
+                "bytes": sum(entry["bytes"] for entry in entries),
+                "p50_wait_s": _percentile([entry["wait_s"] for entry in entries if entry["wait_s"] is not None], 50),
+                "p50_first_batch_s": _percentile(first_batch, 50),
+                "p50_total_s": _percentile([entry["total_s"] for entry in entries], 50),
+                "p95_total_s": _percentile([entry["total_s"] for entry in entries], 95),
+                "max_total_s": max(entry["total_s"] for entry in entries),
+            }
+        return summary
+
+
+def _percentile(values, percent):
+    """The nearest-rank percentile of `values`, or None when there are none."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))]
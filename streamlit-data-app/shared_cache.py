@@ -0,0 +1,173 @@
+import fcntl
+import hashlib
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+from key_locks import KeyLocks
+
+
+def cache_key(*parts):
+    """A stable digest of `parts` that is the same in every process, for use as a store key."""
+    return hashlib.sha256(json.dumps(parts, default=str, sort_keys=True).encode()).hexdigest()
+
+
+class DiskStore:
+    """Arrow tables stored as IPC stream files under `directory`, one file per key.
+
+    Every replica that mounts the same directory shares the entries. Files are written to a
+    temporary name and renamed into place, so readers never see a partial table, and are read
+    through a memory map. `lock(key)` holds an exclusive `flock` on the key's lock file, which
+    the operating system releases if the holder dies. At most `max_entries` tables are kept;
+    the least recently written are removed first, and lock files are removed along with their
+    tables, or on their own when they have no table and nobody holds them.
+
+    A networked store can replace it by providing the same `get`, `put` and `lock` methods.
+    """
+
+    def __init__(self, directory, max_entries=32):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        """Returns `(table, stored_at)` for `key`, or None when nothing is stored."""
+        path = self._path(key, ".arrow")
+        try:
+            stored_at = os.path.getmtime(path)
+            table = pa.ipc.open_stream(pa.memory_map(path)).read_all()
+        except FileNotFoundError:
+            return None
+        return table, stored_at
+
+    def put(self, key, table):
+        """Stores `table` under `key`, replacing what was stored before."""
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temporary, self._path(key, ".arrow"))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self._prune()
+
+    @contextmanager
+    def lock(self, key):
+        """Holds the lock of `key` for every process sharing the directory."""
+        path = self._path(key, ".lock")
+        while True:
+            lock_file = open(path, "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # A lock file pruned while we waited for it no longer excludes anyone; take a new one
+            try:
+                if os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+        try:
+            yield
+        finally:
+            lock_file.close()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _prune(self):
+        entries = []
+        lock_files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".arrow"):
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    pass
+            elif name.endswith(".lock"):
+                lock_files.append(path)
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        kept = {os.path.splitext(path)[0] for _, path in entries[:self.max_entries]}
+        for path in lock_files:
+            if os.path.splitext(path)[0] not in kept:
+                self._remove_lock_file(path)
+
+    @staticmethod
+    def _remove_lock_file(path):
+        """Deletes the lock file `path` unless a process holds it."""
+        try:
+            with open(path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.unlink(path)
+        except (BlockingIOError, FileNotFoundError):
+            pass
+
+
+def load_store(spec, max_entries=32):
+    """Creates the store described by `spec`: a directory for a `DiskStore`, or
+    "package.module:factory" for a store returned by calling `factory()`."""
+    if ":" in spec and os.sep not in spec:
+        module_name, _, factory = spec.partition(":")
+        return getattr(importlib.import_module(module_name), factory)()
+    return DiskStore(spec, max_entries=max_entries)
+
+
+class SharedCache:
+    """A cache of Arrow tables in a store that several processes share, loading each key once.
+
+    `get_or_load` returns the stored table while it is younger than `ttl` seconds. Otherwise
+    the caller takes the key's lock, in this process and in the store, and loads it; callers
+    for the same key in any process wait for that lock and then use the table it stored
+    instead of loading it again. A failed load stores nothing.
+    """
+
+    def __init__(self, store, ttl=30):
+        self.store = store
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._key_locks = KeyLocks()
+        self._stats = {"hits": 0, "loads": 0, "waits": 0}
+
+    def get_or_load(self, key, load):
+        """Returns the table stored under `key`, calling `load()` at most once across processes when it is stale."""
+        table = self._fresh(key)
+        if table is not None:
+            self._count("hits")
+            return table
+        with self._key_locks(key), self.store.lock(key):
+            # Whoever held the lock before us may have just stored a fresh table
+            table = self._fresh(key)
+            if table is not None:
+                self._count("waits")
+                return table
+            self._count("loads")
+            table = load()
+            self.store.put(key, table)
+            return table
+
+    def stats(self):
+        """Returns a snapshot of the cache counters: tables read, loaded, and read after waiting for a load."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _fresh(self, key):
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        table, stored_at = entry
+        return table if time.time() - stored_at < self.ttl else None
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
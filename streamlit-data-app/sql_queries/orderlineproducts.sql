@@ -1,3 +1,6 @@
+-- Every order line item column, as shown by the dashboard's raw line-item table.
+-- The dashboard itself selects only the columns its widgets read (projection.required_columns)
+-- and builds that SELECT list from queries.LINE_ITEM_SELECT; keep the two in step.
 select 
   ug.id as user_group_id,
   og.id as ordergroup_id,
@@ -99,8 +102,6 @@ left join bronze_prod.postgres_prod_restricted_bronze_public.api_usergroup ug
   on u.user_group_id = ug.id
 left join bronze_prod.postgres_prod_restricted_bronze_public.api_seller s
   on sp.seller_id = s.id
-left join bronze_prod.postgres_prod_restricted_bronze_public.api_usergroup ug_seller
-  on s.id = ug_seller.seller_id
 left join bronze_prod.postgres_prod_restricted_bronze_public.api_user uo
   on ug.account_owner_id = uo.id
 left join bronze_prod.postgres_prod_restricted_bronze_public.api_industry i
@@ -0,0 +1,106 @@
+"""Reports what importing the dashboard costs at cold start and checks it against a budget.
+
+Runs the top-level imports of app.py in a fresh interpreter with `-X importtime` and
+prints the most expensive modules. Exits with status 1 when the total import time exceeds
+the budget, so it can guard a deploy or CI step:
+
+    python startup_check.py --budget 2.0
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUDGET_S = 2.0
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def startup_imports(path=os.path.join(APP_DIR, "app.py")):
+    """Returns the modules app.py imports at module level, in order."""
+    with open(path, "r") as f:
+        tree = ast.parse(f.read(), filename=path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure(modules):
+    """Imports `modules` in a fresh interpreter and returns per-module import costs.
+
+    Each entry holds the module name, its own and cumulative import time in seconds and
+    its nesting depth (0 for modules imported directly by app.py or the interpreter).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {module}" for module in modules)],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing the app modules failed:\n{completed.stderr[-2000:]}")
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            entries.append({
+                "module": match.group(4),
+                "self_s": int(match.group(1)) / 1e6,
+                "cumulative_s": int(match.group(2)) / 1e6,
+                "depth": (len(match.group(3)) - 1) // 2,
+            })
+    return entries
+
+
+def report(entries, modules, top=15):
+    """Summarizes `measure` output: the total and the most expensive app-level imports."""
+    top_level = [entry for entry in entries if entry["depth"] == 0]
+    total = sum(entry["cumulative_s"] for entry in top_level)
+    by_module = {entry["module"]: entry["cumulative_s"] for entry in top_level}
+    return {
+        "total_s": round(total, 3),
+        "modules": {module: round(by_module.get(module, 0.0), 3) for module in modules},
+        "slowest": [
+            {"module": entry["module"], "cumulative_s": round(entry["cumulative_s"], 3)}
+            for entry in sorted(entries, key=lambda entry: entry["cumulative_s"], reverse=True)[:top]
+        ],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("DASHBOARD_COLD_START_BUDGET", DEFAULT_BUDGET_S)),
+                        help="maximum total import time in seconds")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    modules = startup_imports()
+    summary = report(measure(modules), modules, top=args.top)
+    summary["budget_s"] = args.budget
+    summary["within_budget"] = summary["total_s"] <= args.budget
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"Cold-start imports: {summary['total_s']:.3f}s (budget {args.budget:.3f}s)")
+        print("app.py imports:")
+        for module, seconds in sorted(summary["modules"].items(), key=lambda item: item[1], reverse=True):
+            print(f"  {seconds:8.3f}s  {module}")
+        print(f"Slowest {args.top} modules, including nested imports:")
+        for entry in summary["slowest"]:
+            print(f"  {entry['cumulative_s']:8.3f}s  {entry['module']}")
+    return 0 if summary["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
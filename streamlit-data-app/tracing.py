@@ -0,0 +1,163 @@
+import contextvars
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+# The trace of the current script run and the innermost open span. Tasks submitted to the
+# query executor run in a copy of the submitting context, so their spans nest correctly.
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Trace:
+    """The spans recorded during one script run, in the order they finished."""
+
+    def __init__(self, name, attributes=None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self):
+        """Returns the finished spans ordered by start time."""
+        with self._lock:
+            return sorted(self._spans, key=lambda span: span["start"])
+
+
+def start_trace(name, **attributes):
+    """Starts a new trace that the spans opened from now on, in this context, are added to."""
+    trace = Trace(name, attributes)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Times the `with` block as span `name` of the current trace.
+
+    Yields the span's attribute dict, so results such as row counts can be added once they
+    are known. An exception leaving the block is recorded as the `error` attribute. Outside
+    of a trace nothing is recorded.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield dict(attributes)
+        return
+    record = {
+        "span_id": next(_span_ids),
+        "parent_id": _current_span.get(),
+        "name": name,
+        "thread": threading.current_thread().name,
+        "start": time.perf_counter(),
+        "attributes": dict(attributes),
+    }
+    token = _current_span.set(record["span_id"])
+    try:
+        yield record["attributes"]
+    except BaseException as e:
+        record["attributes"]["error"] = type(e).__name__
+        raise
+    finally:
+        record["end"] = time.perf_counter()
+        _current_span.reset(token)
+        trace.add(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(log_record(trace, record), default=str))
+
+
+def log_record(trace, span):
+    """The JSON-serializable form of `span`, as written to the span log."""
+    return {
+        "trace_id": trace.trace_id,
+        "trace": trace.name,
+        "trace_attributes": trace.attributes,
+        "span_id": span["span_id"],
+        "parent_id": span["parent_id"],
+        "name": span["name"],
+        "thread": span["thread"],
+        "timestamp": trace.started_at + (span["start"] - trace.started),
+        "offset_ms": round((span["start"] - trace.started) * 1000, 3),
+        "duration_ms": round((span["end"] - span["start"]) * 1000, 3),
+        "attributes": span["attributes"],
+    }
+
+
+def log_spans(stream=None):
+    """Writes every finished span to `stream` (stderr by default) as one JSON object per line.
+
+    Calling it again has no effect, so it is safe to call on every script run.
+    """
+    if any(getattr(handler, "span_log", False) for handler in logger.handlers):
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.span_log = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def span_rows(trace):
+    """One row per span of `trace`, indented by depth, for a table view."""
+    spans = trace.spans()
+    depths = {}
+    rows = []
+    for span in spans:
+        depth = depths.get(span["parent_id"], -1) + 1
+        depths[span["span_id"]] = depth
+        rows.append({
+            "span": "  " * depth + span["name"],
+            "thread": span["thread"],
+            "offset_ms": round((span["start"] - trace.started) * 1000, 1),
+            "duration_ms": round((span["end"] - span["start"]) * 1000, 1),
+            "attributes": json.dumps(span["attributes"], default=str),
+        })
+    return rows
+
+
+def waterfall_options(trace):
+    """Builds an ECharts waterfall of the spans of `trace`: one bar per span, from its start to its end."""
+    rows = span_rows(trace)
+    return {
+        "title": {"text": f"Trace {trace.trace_id}", "left": "center"},
+        "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
+        "grid": {"left": "30%", "top": 40},
+        "xAxis": {"type": "value", "name": "ms"},
+        "yAxis": {"type": "category", "inverse": True, "data": [row["span"] for row in rows]},
+        "series": [
+            {
+                "name": "Start (ms)",
+                "type": "bar",
+                "stack": "waterfall",
+                "itemStyle": {"color": "transparent"},
+                "data": [row["offset_ms"] for row in rows],
+            },
+            {
+                "name": "Duration (ms)",
+                "type": "bar",
+                "stack": "waterfall",
+                "data": [row["duration_ms"] for row in rows],
+            },
+        ],
+    }